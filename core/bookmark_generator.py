@@ -5,26 +5,155 @@ Handles bookmark parsing, management, and PDF generation
 
 import os
 import json
+import time
+import hashlib
 import tempfile
+import threading
+from io import BytesIO
 from collections import deque
-from typing import Optional, List, Dict, Any
+from functools import lru_cache
+from typing import Optional, List, Dict, Any, NamedTuple
 import re
 
 try:
-    import PyPDF2
-    PY_PDF2_AVAILABLE = True
+    import orjson
+    ORJSON_AVAILABLE = True
 except ImportError:
-    PY_PDF2_AVAILABLE = False
-    PyPDF2 = None  # type: ignore
-    print("警告: PyPDF2库未安装，将无法生成书签")
+    ORJSON_AVAILABLE = False
+    orjson = None  # type: ignore
+
+
+# 重量级PDF/图像库按需导入：启动时不再付出导入开销，
+# 首次真正用到时加载一次并缓存（未安装则缓存None并提示）
+@lru_cache(maxsize=None)
+def _load_fitz():
+    try:
+        import fitz  # PyMuPDF
+        return fitz
+    except ImportError:
+        print("提示: PyMuPDF库未安装，将回退到PyPDF2生成书签")
+        return None
 
-try:
-    from pdf2image import convert_from_path
-    PDF_TO_IMAGE_AVAILABLE = True
-except ImportError:
-    PDF_TO_IMAGE_AVAILABLE = False
-    convert_from_path = None
-    print("提示: pdf2image库未安装，将无法提取目录页为图片")
+
+@lru_cache(maxsize=None)
+def _load_pypdf2():
+    try:
+        import PyPDF2
+        return PyPDF2
+    except ImportError:
+        print("警告: PyPDF2库未安装，将无法生成书签")
+        return None
+
+
+@lru_cache(maxsize=None)
+def _load_convert_from_bytes():
+    try:
+        from pdf2image import convert_from_bytes
+        return convert_from_bytes
+    except ImportError:
+        print("提示: pdf2image库未安装，将无法提取目录页为图片")
+        return None
+
+
+def _dump_json_bytes(data: Dict[str, Any], indent: bool = True) -> bytes:
+    """序列化数据为UTF-8字节，优先使用orjson（C实现）
+    indent=False时输出紧凑格式（无缩进、无多余空格），适合机器读写的文件
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _load_json_bytes(data) -> Any:
+    """从UTF-8字节（bytes/bytearray/memoryview）解析JSON，优先使用orjson（C实现）"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(bytes(data).decode('utf-8'))
+
+
+def _write_json(file_path: str, data: Dict[str, Any]) -> None:
+    """序列化数据并写入JSON文件"""
+    with open(file_path, 'wb') as f:
+        f.write(_dump_json_bytes(data))
+
+
+# 草稿v2格式的列头：键名只写一次，书签按行存为定长数组
+_DRAFT_BOOKMARK_KEYS = ('title', 'page', 'level')
+
+
+def _pack_bookmark_rows(bookmarks: List[Dict[str, Any]]) -> List[List[Any]]:
+    """把书签字典列表压缩为键头+行数组形式（去掉每条记录重复的键名）"""
+    return [[b['title'], b['page'], b['level']] for b in bookmarks]
+
+
+def _unpack_bookmark_rows(rows: List[Any], keys=_DRAFT_BOOKMARK_KEYS) -> List[Dict[str, Any]]:
+    """还原行数组为书签字典列表，兼容旧版草稿的字典列表格式"""
+    if rows and isinstance(rows[0], dict):
+        return list(rows)
+    return [dict(zip(keys, row)) for row in rows]
+
+
+class BookmarkRecord(NamedTuple):
+    """书签的不可变紧凑表示
+    字典形式是前端和草稿文件的数据格式，内部快照用NamedTuple，
+    每条记录只占一个定长元组而非完整的字典
+    """
+    title: str
+    page: Optional[int]
+    level: int
+
+    @classmethod
+    def from_dict(cls, bookmark: Dict[str, Any]) -> 'BookmarkRecord':
+        return cls(bookmark['title'], bookmark['page'], bookmark['level'])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'title': self.title, 'page': self.page, 'level': self.level}
+
+
+def _snapshot_bookmarks(bookmarks: List[Dict[str, Any]]) -> tuple:
+    """把书签列表固化为不可变记录快照，历史记录之间可安全共享"""
+    return tuple(BookmarkRecord.from_dict(b) for b in bookmarks)
+
+
+def _restore_bookmarks(snapshot: tuple) -> List[Dict[str, Any]]:
+    """从记录快照还原出可变的书签字典列表"""
+    return [record.to_dict() for record in snapshot]
+
+
+# parse_toc_text逐行使用的正则，提前编译避免热循环中重复的缓存查找
+_RE_DOTS = re.compile(r'\.{3,}|\s{2,}$')
+_RE_CHAPTER = re.compile(r'^(\d+\.)*\d+')
+_RE_CN_NUMERAL = re.compile(r'^[一二三四五六七八九十百千万]+[、:]')
+_RE_ROMAN_NUMERAL = re.compile(r'^[IVXLCDM]+[\.、:]')
+
+# 行首标记符号均为单字符，可直接交给C层的lstrip一次剥离
+_PREFIX_CHARS = '#*-•★☆▶►→⇒'
+
+# 单个正则一次完成：识别Markdown标题标记、剥离行首标记、
+# 拆出标题主体、提取行尾页码
+_RE_TOC_LINE = re.compile(
+    r'^(?P<md>#{1,4}\s+)?[' + re.escape(_PREFIX_CHARS) +
+    r' \t]*(?P<title>.*?)\s*(?P<page>\d+)?\s*$')
+
+# 特殊关键词，按对层级的影响分组
+_KEYWORDS_TOP = ('前言', '序言', '附录', '参考文献', '索引')
+_KEYWORDS_CHAPTER = ('章节', '章', '篇')
+_KEYWORDS_SECTION = ('节', '项', '条')
+_KEYWORDS_SUBSECTION = ('小节', '子项', '子条')
+
+# 每组关键词合成一个正则交替：一次C层扫描代替Python层any()逐词in；
+# delta为0表示层级保底到0，否则在当前层级上加深并封顶到3
+_KEYWORD_LEVEL_RULES = tuple(
+    (re.compile('|'.join(re.escape(k) for k in keywords)), delta)
+    for keywords, delta in (
+        (_KEYWORDS_TOP, 0),
+        (_KEYWORDS_CHAPTER, 0),
+        (_KEYWORDS_SECTION, 1),
+        (_KEYWORDS_SUBSECTION, 2),
+    )
+)
 
 
 class PDFBookmarkGenerator:
@@ -42,15 +171,86 @@ class PDFBookmarkGenerator:
         self.history = deque(maxlen=5)
         # 草稿文件路径
         self.draft_file = os.path.join(tempfile.gettempdir(), "pdf_bookmark_draft.json")
+        # 草稿写入合并：两次落盘之间至少间隔该秒数，中间的修改只标记脏位
+        self._draft_min_interval = 1.0
+        # 上传PDF的内容缓存：((路径, 修改时间), 字节内容)
+        self._pdf_cache = None
+        # 解析好的PyPDF2 PdfReader缓存，与内容缓存同键
+        self._reader_cache = None
+        # 搜索用的标题casefold缓存：(标题元组, casefold列表)
+        self._title_index_cache = None
+        # 最近一次目录解析的缓存：(输入文本摘要, 解析结果快照)
+        self._parse_cache = None
+        self._draft_last_write = 0.0
+        self._draft_dirty = False
+        # 上次落盘内容的摘要，内容未变时跳过重复写入
+        self._draft_last_hash = None
+        # 间隔内的尾随修改由后台定时器落盘，不占用请求线程
+        self._draft_timer: Optional[threading.Timer] = None
+        self._draft_lock = threading.Lock()
         # 自动加载草稿
         self.load_draft()
 
+    def _get_pdf_bytes(self) -> Optional[bytes]:
+        """读取上传的PDF内容并缓存
+        以(路径, 修改时间)为键，重新上传或替换文件后自动失效，
+        避免每次生成/提取操作都重新读盘
+        """
+        if not self.uploaded_file or not os.path.exists(self.uploaded_file):
+            return None
+        cache_key = (self.uploaded_file, os.path.getmtime(self.uploaded_file))
+        if self._pdf_cache is None or self._pdf_cache[0] != cache_key:
+            with open(self.uploaded_file, 'rb') as f:
+                self._pdf_cache = (cache_key, f.read())
+        return self._pdf_cache[1]
+
+    def _get_pdf_reader(self):
+        """
+        缓存的PyPDF2 PdfReader
+        交叉引用表的解析只做一次，文件被替换后随内容缓存一起失效
+        """
+        PyPDF2 = _load_pypdf2()
+        if PyPDF2 is None:
+            return None
+        pdf_bytes = self._get_pdf_bytes()
+        if pdf_bytes is None:
+            return None
+        cache_key = self._pdf_cache[0]
+        if self._reader_cache is None or self._reader_cache[0] != cache_key:
+            self._reader_cache = (cache_key, PyPDF2.PdfReader(BytesIO(pdf_bytes)))
+        return self._reader_cache[1]
+
     def save_draft(self):
-        """保存当前状态为草稿"""
+        """保存当前状态为草稿
+        连续编辑时按最小间隔合并写入，摊薄磁盘I/O
+        """
+        self._draft_dirty = True
+        if time.monotonic() - self._draft_last_write < self._draft_min_interval:
+            # 刚写过盘，本次只标记，由后台定时器在间隔结束后合并落盘，
+            # 避免尾随的最后一次修改丢失
+            if self._draft_timer is None or not self._draft_timer.is_alive():
+                self._draft_timer = threading.Timer(self._draft_min_interval, self.flush_draft)
+                self._draft_timer.daemon = True
+                self._draft_timer.start()
+            return
+        self.flush_draft()
+
+    def flush_draft(self):
+        """立即将当前状态写入草稿文件（请求线程与定时器线程共用，加锁防止交错写入）"""
+        if not self._draft_dirty:
+            return
+        with self._draft_lock:
+            self._flush_draft_locked()
+
+    def _flush_draft_locked(self):
+        if not self._draft_dirty:
+            return
         try:
             draft_data = {
-                'bookmarks': self.bookmarks,
-                'original_bookmarks': self.original_bookmarks,
+                'version': 2,
+                'bookmark_keys': list(_DRAFT_BOOKMARK_KEYS),
+                'bookmarks': _pack_bookmark_rows(self.bookmarks),
+                'original_bookmarks': _pack_bookmark_rows(self.original_bookmarks),
                 'offset': self.offset,
                 'toc_start_page': self.toc_start_page,
                 'toc_end_page': self.toc_end_page,
@@ -58,8 +258,15 @@ class PDFBookmarkGenerator:
                 'output_filename': self.output_filename,
                 'original_filename': self.original_filename
             }
-            with open(self.draft_file, 'w', encoding='utf-8') as f:
-                json.dump(draft_data, f, ensure_ascii=False, indent=2)
+            # 草稿只被程序自己读取，用紧凑格式省去缩进带来的体积和格式化开销
+            payload = _dump_json_bytes(draft_data, indent=False)
+            digest = hashlib.md5(payload).digest()
+            if digest != self._draft_last_hash or not os.path.exists(self.draft_file):
+                with open(self.draft_file, 'wb') as f:
+                    f.write(payload)
+                self._draft_last_hash = digest
+            self._draft_last_write = time.monotonic()
+            self._draft_dirty = False
         except Exception as e:
             print(f"保存草稿失败: {e}")
 
@@ -70,8 +277,10 @@ class PDFBookmarkGenerator:
                 with open(self.draft_file, 'r', encoding='utf-8') as f:
                     draft_data = json.load(f)
 
-                self.bookmarks = draft_data.get('bookmarks', [])
-                self.original_bookmarks = draft_data.get('original_bookmarks', [])
+                keys = tuple(draft_data.get('bookmark_keys', _DRAFT_BOOKMARK_KEYS))
+                self.bookmarks = _unpack_bookmark_rows(draft_data.get('bookmarks', []), keys)
+                self.original_bookmarks = _unpack_bookmark_rows(
+                    draft_data.get('original_bookmarks', []), keys)
                 self.offset = draft_data.get('offset', 0)
                 self.toc_start_page = draft_data.get('toc_start_page', 1)
                 self.toc_end_page = draft_data.get('toc_end_page', 1)
@@ -85,16 +294,19 @@ class PDFBookmarkGenerator:
     def clear_draft(self):
         """清除草稿"""
         try:
+            self._draft_dirty = False
             if os.path.exists(self.draft_file):
                 os.remove(self.draft_file)
         except Exception as e:
             print(f"清除草稿失败: {e}")
 
     def save_state(self):
-        """保存当前状态用于撤销操作"""
+        """保存当前状态用于撤销操作
+        快照为不可变元组，后续的原地修改不会影响历史记录
+        """
         state = {
-            'bookmarks': [bookmark.copy() for bookmark in self.bookmarks],
-            'original_bookmarks': [bookmark.copy() for bookmark in self.original_bookmarks],
+            'bookmarks': _snapshot_bookmarks(self.bookmarks),
+            'original_bookmarks': _snapshot_bookmarks(self.original_bookmarks),
             'offset': self.offset
         }
         self.history.append(state)
@@ -106,8 +318,8 @@ class PDFBookmarkGenerator:
             self.history.pop()
             # 恢复到上一个状态
             prev_state = self.history[-1]
-            self.bookmarks = [bookmark.copy() for bookmark in prev_state['bookmarks']]
-            self.original_bookmarks = [bookmark.copy() for bookmark in prev_state['original_bookmarks']]
+            self.bookmarks = _restore_bookmarks(prev_state['bookmarks'])
+            self.original_bookmarks = _restore_bookmarks(prev_state['original_bookmarks'])
             self.offset = prev_state['offset']
             self.save_draft()
             return True
@@ -118,104 +330,87 @@ class PDFBookmarkGenerator:
         解析目录文本，提取标题和页码信息
         """
         self.save_state()
+
+        # 相同文本重复解析时直接还原上次的结果快照
+        cache_key = hashlib.md5(toc_text.encode('utf-8')).digest()
+        if self._parse_cache is not None and self._parse_cache[0] == cache_key:
+            snapshot = self._parse_cache[1]
+            bookmarks = _restore_bookmarks(snapshot)
+            self.original_bookmarks = _restore_bookmarks(snapshot)
+            self.save_draft()
+            return bookmarks
+
         bookmarks = []
-        lines = toc_text.strip().split('\n')
+        # splitlines()在C层同时处理\n和\r\n，免去后续逐行strip掉\r
+        lines = toc_text.strip().splitlines()
 
-        # 先收集所有Markdown层级信息，用于后续计算相对层级
+        # 第一遍：每行只做一次统一正则匹配，顺带收集Markdown层级信息，
+        # 匹配结果保留给第二遍复用
+        parsed_lines = []
         markdown_levels = set()
         for line in lines:
             line = line.strip()
             if not line:
                 continue
-
-            # 检查Markdown风格的标题标记
-            markdown_match = re.match(r'^(#{1,4})\s+(.+)', line)
-            if markdown_match:
-                level = len(markdown_match.group(1))
-                markdown_levels.add(level)
+            line_match = _RE_TOC_LINE.match(line)
+            md_mark = line_match.group('md')
+            if md_mark:
+                markdown_levels.add(len(md_mark.strip()))
+            parsed_lines.append((line, line_match))
 
         # 创建层级映射，使最小的层级成为第0级
-        sorted_levels = sorted(list(markdown_levels))
+        sorted_levels = sorted(markdown_levels)
         level_mapping = {level: idx for idx, level in enumerate(sorted_levels)}
 
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-
-            # 保存原始行内容
-            original_line = line
-
-            # 移除行首的标记符号
-            prefixes = ['#', '*', '-', '•', '★', '☆', '▶', '►', '→', '⇒']
-            while any(line.startswith(prefix) for prefix in prefixes):
-                for prefix in prefixes:
-                    if line.startswith(prefix):
-                        line = line[len(prefix):].strip()
-                        break
-
-            # 尝试提取页码（数字在行尾）
-            page_match = re.search(r'(\d+)(?:\s*)$', line)
-            page_num = None
-            title = line
-
-            if page_match:
-                page_num = int(page_match.group(1))
-                title = line[:page_match.start()].strip()
+        for original_line, line_match in parsed_lines:
+            title = line_match.group('title')
+            page_str = line_match.group('page')
+            page_num = int(page_str) if page_str else None
 
             # 移除标题中的点线或其他分隔符
-            title = re.sub(r'\.{3,}|\s{2,}$', '', title).strip()
+            title = _RE_DOTS.sub('', title).strip()
 
             # 确定层级
             level = 0
 
             # 方法1: 检查缩进
-            original_title_part = original_line
             # 移除行首符号
-            for prefix in prefixes:
-                if original_title_part.startswith(prefix):
-                    original_title_part = original_title_part[len(prefix):].strip()
-                    break
+            original_title_part = original_line.lstrip(_PREFIX_CHARS).strip()
             # 检查缩进空格数
             leading_spaces = len(original_title_part) - len(original_title_part.lstrip())
             if leading_spaces > 0:
                 level = min(3, leading_spaces // 2)
 
             # 方法2: 检查是否有层级编号（如1.1, 1.1.1等）
-            chapter_match = re.search(r'^(\d+\.)*\d+', title)
+            chapter_match = _RE_CHAPTER.search(title)
             if chapter_match:
                 dots = chapter_match.group(0).count('.')
                 level = max(level, dots)
 
-            # 方法3: 检查Markdown风格的标题标记
-            markdown_match = re.match(r'^(#{1,4})\s+(.+)', original_line)
-            if markdown_match:
-                original_level = len(markdown_match.group(1))
+            # 方法3: 检查Markdown风格的标题标记（复用第一遍的匹配结果）
+            md_mark = line_match.group('md')
+            if md_mark:
+                original_level = len(md_mark.strip())
                 level = level_mapping.get(original_level, original_level - 1)
-                title = markdown_match.group(2)
+                title = original_line[line_match.end('md'):]
 
             # 方法4: 检查中文编号模式（如一、二、三等）
-            chinese_numeral_match = re.search(r'^[一二三四五六七八九十百千万]+[、:]', title)
+            chinese_numeral_match = _RE_CN_NUMERAL.search(title)
             if chinese_numeral_match:
                 level = max(level, 0)
 
             # 方法5: 检查罗马数字模式（如I, II, III等）
-            roman_numeral_match = re.search(r'^[IVXLCDM]+[\.、:]', title)
+            roman_numeral_match = _RE_ROMAN_NUMERAL.search(title)
             if roman_numeral_match:
                 level = max(level, 0)
 
-            # 方法6: 检查特殊关键词
-            if any(keyword in title for keyword in ['前言', '序言', '附录', '参考文献', '索引']):
-                level = max(level, 0)
-
-            if any(keyword in title for keyword in ['章节', '章', '篇']):
-                level = max(level, 0)
-
-            if any(keyword in title for keyword in ['节', '项', '条']):
-                level = min(level + 1, 3)
-
-            if any(keyword in title for keyword in ['小节', '子项', '子条']):
-                level = min(level + 2, 3)
+            # 方法6: 检查特殊关键词（查预编译的规则表）
+            for keyword_pattern, delta in _KEYWORD_LEVEL_RULES:
+                if keyword_pattern.search(title):
+                    if delta == 0:
+                        level = max(level, 0)
+                    else:
+                        level = min(level + delta, 3)
 
             bookmarks.append({
                 'title': title,
@@ -225,6 +420,7 @@ class PDFBookmarkGenerator:
 
         # 保存原始书签（未应用偏移量）
         self.original_bookmarks = [bookmark.copy() for bookmark in bookmarks]
+        self._parse_cache = (cache_key, _snapshot_bookmarks(bookmarks))
         self.save_draft()
         return bookmarks
 
@@ -239,22 +435,28 @@ class PDFBookmarkGenerator:
             return self.content_start_page - 1
         return 0
 
-    def apply_offset(self, bookmarks: List[Dict[str, Any]], offset: Optional[int] = None) -> List[Dict[str, Any]]:
+    def apply_offset(self, bookmarks: List[Dict[str, Any]], offset: Optional[int] = None,
+                     in_place: bool = False) -> List[Dict[str, Any]]:
         """
         将偏移量应用到书签页码
+        in_place=True时直接改写传入的列表，调用方确定不再需要
+        原页码时可省掉整份字典复制
         """
         if offset is None:
             offset = self.offset
 
-        # 应用偏移量到书签页码
-        result_bookmarks = []
-        for bookmark in bookmarks:
-            new_bookmark = bookmark.copy()
-            if new_bookmark['page'] is not None:
-                new_bookmark['page'] = new_bookmark['page'] + offset
-            result_bookmarks.append(new_bookmark)
+        if in_place:
+            if offset:
+                for bookmark in bookmarks:
+                    if bookmark['page'] is not None:
+                        bookmark['page'] += offset
+            return bookmarks
 
-        return result_bookmarks
+        # 单次遍历直接构建结果字典，避免先copy再改写的双重开销
+        return [{'title': bookmark['title'],
+                 'page': bookmark['page'] + offset if bookmark['page'] is not None else None,
+                 'level': bookmark['level']}
+                for bookmark in bookmarks]
 
     def add_bookmark(self, title: str, page: Optional[int], level: int = 0) -> None:
         """
@@ -292,15 +494,18 @@ class PDFBookmarkGenerator:
         """
         if 0 <= index < len(self.bookmarks):
             self.save_state()
+            # 只取一次引用，避免每个字段都重复走两次列表索引
+            bookmark = self.bookmarks[index]
+            original = self.original_bookmarks[index]
             if title is not None:
-                self.bookmarks[index]['title'] = title
-                self.original_bookmarks[index]['title'] = title
+                bookmark['title'] = title
+                original['title'] = title
             if page is not None:
-                self.bookmarks[index]['page'] = page
-                self.original_bookmarks[index]['page'] = page
+                bookmark['page'] = page
+                original['page'] = page
             if level is not None:
-                self.bookmarks[index]['level'] = level
-                self.original_bookmarks[index]['level'] = level
+                bookmark['level'] = level
+                original['level'] = level
             self.save_draft()
 
     def move_bookmark(self, index: int, direction: str) -> None:
@@ -318,12 +523,42 @@ class PDFBookmarkGenerator:
                 self.original_bookmarks[index], self.original_bookmarks[index+1] = self.original_bookmarks[index+1], self.original_bookmarks[index]
             self.save_draft()
 
+    def move_bookmarks_batch(self, indices: List[int], direction: str) -> List[List[int]]:
+        """
+        批量移动书签，整批只保存一次状态和草稿
+        direction: 'up' 或 'down'
+        返回实际执行的交换列表[[from, to], ...]，供前端在本地重演
+        """
+        valid = [i for i in indices if 0 <= i < len(self.bookmarks)]
+        if not valid:
+            return []
+
+        self.save_state()
+        ops: List[List[int]] = []
+        if direction == 'up':
+            # 从小到大排序，确保前面的先移动
+            for index in sorted(valid):
+                if index > 0:
+                    self.bookmarks[index], self.bookmarks[index-1] = self.bookmarks[index-1], self.bookmarks[index]
+                    self.original_bookmarks[index], self.original_bookmarks[index-1] = self.original_bookmarks[index-1], self.original_bookmarks[index]
+                    ops.append([index, index - 1])
+        else:
+            # 从大到小排序，确保后面的先移动
+            for index in sorted(valid, reverse=True):
+                if index < len(self.bookmarks) - 1:
+                    self.bookmarks[index], self.bookmarks[index+1] = self.bookmarks[index+1], self.bookmarks[index]
+                    self.original_bookmarks[index], self.original_bookmarks[index+1] = self.original_bookmarks[index+1], self.original_bookmarks[index]
+                    ops.append([index, index + 1])
+        self.save_draft()
+        return ops
+
     def extract_toc_pages(self, start_page: Optional[int] = None,
                          end_page: Optional[int] = None) -> Optional[str]:
         """
         提取目录页为图片
         """
-        if not PDF_TO_IMAGE_AVAILABLE:
+        convert_pages = _load_convert_from_bytes()
+        if convert_pages is None:
             return None
 
         if not self.uploaded_file:
@@ -336,22 +571,34 @@ class PDFBookmarkGenerator:
             end_page = self.toc_end_page
 
         try:
-            # 转换PDF页面为图片
-            images = []
-            if PDF_TO_IMAGE_AVAILABLE and convert_from_path is not None:
-                images = convert_from_path(
-                    self.uploaded_file,
-                    first_page=start_page or self.toc_start_page,
-                    last_page=end_page or self.toc_end_page
-                )
+            # 转换PDF页面为图片（走缓存的文件内容，免去pdf2image再次读盘）
+            pdf_bytes = self._get_pdf_bytes()
+            if pdf_bytes is None:
+                return None
+
+            # 文件名带上(文件, 修改时间, 页码范围)的摘要：
+            # 同一份PDF的同一段目录页重复提取时直接复用已有图片，
+            # 不再调用poppler渲染，也避免在临时目录里堆积重复文件
+            temp_dir = tempfile.gettempdir()
+            cache_key = f"{self.uploaded_file}|{os.path.getmtime(self.uploaded_file)}|{start_page}|{end_page}"
+            digest = hashlib.md5(cache_key.encode('utf-8')).hexdigest()[:12]
+            image_path = os.path.join(temp_dir, f"toc_pages_{digest}.png")
+            if os.path.exists(image_path):
+                return image_path
+
+            # 150 DPI对目录文字识别已经足够，渲染量比默认200 DPI少约一半；
+            # thread_count让poppler并行渲染多页
+            images = convert_pages(
+                pdf_bytes,
+                first_page=start_page or self.toc_start_page,
+                last_page=end_page or self.toc_end_page,
+                dpi=150,
+                thread_count=min(4, os.cpu_count() or 1)
+            )
 
             if images:
-                # 保存图片到临时目录
-                temp_dir = tempfile.gettempdir()
-
                 # 如果只有一页，直接保存
                 if len(images) == 1:
-                    image_path = os.path.join(temp_dir, "toc_page.png")
                     images[0].save(image_path, 'PNG')
                     return image_path
                 else:
@@ -365,15 +612,18 @@ class PDFBookmarkGenerator:
                     # 创建新的图像
                     new_image = Image.new('RGB', (max_width, total_height), (255, 255, 255))
 
-                    # 粘贴每张图片
+                    # 粘贴每张图片，粘贴完立即释放源页面，
+                    # 峰值内存只保留目标图加一页，而不是全部页面的两份
                     y_offset = 0
                     for img in images:
                         new_image.paste(img, (0, y_offset))
                         y_offset += img.size[1]
+                        img.close()
+                    images.clear()
 
                     # 保存合并后的图像
-                    image_path = os.path.join(temp_dir, "toc_pages.png")
                     new_image.save(image_path, 'PNG')
+                    new_image.close()
                     return image_path
         except Exception as e:
             print(f"提取目录页时出错: {e}")
@@ -390,8 +640,7 @@ class PDFBookmarkGenerator:
                 'original_bookmarks': self.original_bookmarks,
                 'offset': self.offset
             }
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(export_data, f, ensure_ascii=False, indent=2)
+            _write_json(file_path, export_data)
             return True
         except Exception as e:
             print(f"导出书签失败: {e}")
@@ -415,18 +664,25 @@ class PDFBookmarkGenerator:
             print(f"导入书签失败: {e}")
             return False
 
+    def _get_title_index(self) -> List[str]:
+        """
+        书签标题的casefold索引
+        以当前标题元组为键校验缓存，书签被增删改后自动重建
+        """
+        titles = tuple(bookmark['title'] for bookmark in self.bookmarks)
+        if self._title_index_cache is None or self._title_index_cache[0] != titles:
+            self._title_index_cache = (titles, [title.casefold() for title in titles])
+        return self._title_index_cache[1]
+
     def search_bookmarks(self, keyword: str) -> List[Dict[str, Any]]:
         """
         搜索书签
         """
-        results = []
-        for i, bookmark in enumerate(self.bookmarks):
-            if keyword.lower() in bookmark['title'].lower():
-                results.append({
-                    'index': i,
-                    'bookmark': bookmark
-                })
-        return results
+        keyword_cf = keyword.casefold()
+        folded_titles = self._get_title_index()
+        return [{'index': i, 'bookmark': self.bookmarks[i]}
+                for i, title_cf in enumerate(folded_titles)
+                if keyword_cf in title_cf]
 
     def filter_bookmarks_by_level(self, level: int) -> List[Dict[str, Any]]:
         """
@@ -458,17 +714,24 @@ class PDFBookmarkGenerator:
                     if self.original_bookmarks[index]['page'] is not None:
                         self.original_bookmarks[index]['page'] += page_offset
                 if level_offset is not None:
+                    # 条件表达式夹紧到[0, 3]，常见情况（已在范围内）只比较不调函数
                     new_level = self.bookmarks[index]['level'] + level_offset
-                    self.bookmarks[index]['level'] = max(0, min(3, new_level))
-                    self.original_bookmarks[index]['level'] = max(0, min(3, new_level))
+                    if new_level < 0:
+                        new_level = 0
+                    elif new_level > 3:
+                        new_level = 3
+                    self.bookmarks[index]['level'] = new_level
+                    self.original_bookmarks[index]['level'] = new_level
         self.save_draft()
 
     def generate_pdf_with_bookmarks(self, output_path: Optional[str] = None) -> bool:
         """
         生成带书签的PDF文件
+        优先使用PyMuPDF（单次set_toc调用，速度远快于逐条添加），
+        未安装时回退到PyPDF2
         """
-        if not PY_PDF2_AVAILABLE:
-            print("错误: 需要安装PyPDF2库才能生成带书签的PDF")
+        if _load_fitz() is None and _load_pypdf2() is None:
+            print("错误: 需要安装PyMuPDF或PyPDF2库才能生成带书签的PDF")
             return False
 
         if not self.uploaded_file:
@@ -479,82 +742,111 @@ class PDFBookmarkGenerator:
             print("错误: 没有书签数据")
             return False
 
-        try:
-            # 读取原始PDF
-            with open(self.uploaded_file, 'rb') as infile:
-                if PyPDF2 is None:
-                    raise RuntimeError("PyPDF2库未安装，无法生成PDF")
-                    
-                reader = PyPDF2.PdfReader(infile)
-                writer = PyPDF2.PdfWriter()
-
-                # 复制所有页面
-                for page in reader.pages:
-                    writer.add_page(page)
-
-                # 添加书签
-                bookmark_map = {}
-                bookmarks_added = 0
-
-                for i, bookmark in enumerate(self.bookmarks):
-                    title = bookmark['title']
-                    page_num = bookmark['page']
-                    level = bookmark['level']
-
-                    # 修复页码索引问题：用户输入的是1基索引，PDF内部使用0基索引
-                    # 修正：用户输入的页码已经是应用偏移量后的结果，应直接减1转换为0基索引
-                    # 修复问题：确保页码不小于1，并且不超过PDF总页数
-                    if page_num is not None and 1 <= page_num <= len(reader.pages):
-                        try:
-                            # 根据层级添加书签
-                            if level == 0:
-                                # 顶级书签
-                                parent = writer.add_outline_item(title, page_num-1)
-                                bookmark_map[i] = parent
-                                bookmarks_added += 1
-                            elif level > 0:
-                                # 子书签（正确处理层级嵌套）
-                                # 找到最近的、层级比当前层级低的父书签
-                                parent_key = None
-                                for key in reversed(list(bookmark_map.keys())):
-                                    if key < i and self.bookmarks[key]['level'] < level:
-                                        parent_key = key
-                                        break
-
-                                if parent_key is not None:
-                                    parent = bookmark_map[parent_key]
-                                    child = writer.add_outline_item(title, page_num-1, parent=parent)
-                                    bookmark_map[i] = child
-                                    bookmarks_added += 1
-                                else:
-                                    # 如果没有找到合适的父书签，则作为顶级书签添加
-                                    parent = writer.add_outline_item(title, page_num-1)
-                                    bookmark_map[i] = parent
-                                    bookmarks_added += 1
-                        except Exception as e:
-                            print(f"添加书签 '{title}' 时出错: {e}")
-                    else:
-                        print(f"警告: 书签 '{title}' 的页码 {page_num} 超出范围 (1-{len(reader.pages)})")
+        # 确定输出文件路径
+        if output_path is None:
+            # 默认输出路径
+            output_dir = os.path.join(os.path.expanduser("~"), "Documents", "pdf编目")
+            os.makedirs(output_dir, exist_ok=True)
+            output_path = os.path.join(output_dir, self.output_filename)
 
-                print(f"成功添加 {bookmarks_added} 个书签")
-
-                # 写入输出文件
-                if output_path is None:
-                    # 默认输出路径
-                    output_dir = os.path.join(os.path.expanduser("~"), "Documents", "pdf编目")
-                    os.makedirs(output_dir, exist_ok=True)
-                    output_path = os.path.join(output_dir, self.output_filename)
-
-                with open(output_path, 'wb') as outfile:
-                    writer.write(outfile)
+        try:
+            if _load_fitz() is not None:
+                success = self._generate_with_fitz(output_path)
+            else:
+                success = self._generate_with_pypdf2(output_path)
 
+            if success:
                 print(f"成功生成带书签的PDF文件: {output_path}")
                 # 清除草稿
                 self.clear_draft()
-                return True
-
+            return success
         except Exception as e:
             print(f"生成PDF时出错: {e}")
             return False
 
-        return False
\ No newline at end of file
+    def _generate_with_fitz(self, output_path: str) -> bool:
+        """
+        使用PyMuPDF生成带书签的PDF
+        无需逐页复制，整个目录通过一次set_toc调用写入
+        """
+        fitz = _load_fitz()
+        pdf_bytes = self._get_pdf_bytes()
+        doc = fitz.open(stream=pdf_bytes, filetype='pdf')
+        try:
+            page_count = doc.page_count
+
+            # 构建目录列表，PyMuPDF根据层级列自动推断父子关系
+            # set_toc要求层级从1开始且每次最多加深一级，这里做相应的钳制
+            toc = []
+            prev_level = 0
+            for bookmark in self.bookmarks:
+                page_num = bookmark['page']
+                if page_num is None or not (1 <= page_num <= page_count):
+                    print(f"警告: 书签 '{bookmark['title']}' 的页码 {page_num} 超出范围 (1-{page_count})")
+                    continue
+                level = min(bookmark['level'] + 1, prev_level + 1)
+                toc.append([level, bookmark['title'], page_num])
+                prev_level = level
+
+            doc.set_toc(toc)
+            doc.save(output_path, garbage=4, deflate=True, incremental=False)
+            print(f"成功添加 {len(toc)} 个书签")
+            return True
+        finally:
+            doc.close()
+
+    def _generate_with_pypdf2(self, output_path: str) -> bool:
+        """
+        使用PyPDF2生成带书签的PDF（PyMuPDF未安装时的回退方案）
+        """
+        # 复用缓存的PdfReader，免去重复读盘和交叉引用表解析
+        reader = self._get_pdf_reader()
+        writer = _load_pypdf2().PdfWriter()
+
+        # 复制所有页面（新版PyPDF2提供append，一次调用挂载全部页面，
+        # 避免逐页的间接对象复制；旧版本回退到逐页add_page）
+        if hasattr(writer, 'append'):
+            writer.append(reader)
+        else:
+            for page in reader.pages:
+                writer.add_page(page)
+
+        # 添加书签
+        # 维护一个按层级记录最近书签的栈，父书签查找为O(1)，
+        # 整个目录只需一次正向遍历
+        parent_stack: List[Any] = [None, None, None, None]
+        bookmarks_added = 0
+        # len(reader.pages)在PyPDF2中并非免费操作，循环外取一次
+        page_count = len(reader.pages)
+
+        for bookmark in self.bookmarks:
+            title = bookmark['title']
+            page_num = bookmark['page']
+            level = bookmark['level']
+
+            # 修复页码索引问题：用户输入的是1基索引，PDF内部使用0基索引
+            # 修正：用户输入的页码已经是应用偏移量后的结果，应直接减1转换为0基索引
+            # 修复问题：确保页码不小于1，并且不超过PDF总页数
+            if page_num is not None and 1 <= page_num <= page_count:
+                try:
+                    # 找到最近的、层级比当前层级低的父书签（没有则作为顶级书签）
+                    parent = next((parent_stack[k] for k in range(level - 1, -1, -1)
+                                   if parent_stack[k] is not None), None)
+                    item = writer.add_outline_item(title, page_num-1, parent=parent)
+                    parent_stack[level] = item
+                    # 清除更深层级的过期父书签
+                    for k in range(level + 1, len(parent_stack)):
+                        parent_stack[k] = None
+                    bookmarks_added += 1
+                except Exception as e:
+                    print(f"添加书签 '{title}' 时出错: {e}")
+            else:
+                print(f"警告: 书签 '{title}' 的页码 {page_num} 超出范围 (1-{page_count})")
+
+        print(f"成功添加 {bookmarks_added} 个书签")
+
+        # 写入输出文件
+        with open(output_path, 'wb') as outfile:
+            writer.write(outfile)
+
+        return True
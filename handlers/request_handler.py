@@ -2,1457 +2,631 @@
 Request handlers for the PDF Bookmark Generator web interface
 """
 
-import json
-import cgi
+import gzip
+import shutil
 import tempfile
+import threading
+import time
+import uuid
 import os
 from http.server import BaseHTTPRequestHandler
-from urllib.parse import parse_qs
+from urllib.parse import parse_qs, unquote
 
-from core.bookmark_generator import PDFBookmarkGenerator
+import hashlib
+
+from core.bookmark_generator import PDFBookmarkGenerator, _dump_json_bytes, _load_json_bytes
+
+# 页面在进程生命周期内不变：导入时编码一次，
+# 每个请求直接写出缓存的字节，不再反复构建和编码大字符串。
+# CSS/JS拆成独立静态资源，带内容指纹和长缓存头，
+# 浏览器二次访问时只需重新拿很小的HTML外壳
+from ui.components import get_html_content, get_css_content, get_js_content
+from utils.helpers import escape_html
+
+_CSS_BYTES = get_css_content().encode('utf-8')
+_JS_BYTES = get_js_content().encode('utf-8')
+_ASSET_ETAG = hashlib.md5(_CSS_BYTES + _JS_BYTES).hexdigest()
+
+_HTML_BYTES = get_html_content(_ASSET_ETAG).encode('utf-8')
+# HTML/CSS/JS高度可压缩，预先压好；支持gzip的浏览器直接收压缩字节
+_HTML_GZIP = gzip.compress(_HTML_BYTES, 9)
+
+_STATIC_ASSETS = {
+    'app.css': (_CSS_BYTES, 'text/css; charset=utf-8'),
+    'app.js': (_JS_BYTES, 'application/javascript; charset=utf-8'),
+}
+
+# 临时目录在进程生命周期内不变，取一次存成常量
+_TMP_DIR = tempfile.gettempdir()
 
 
 class RequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1默认keep-alive：同一个TCP连接复用于前端的连续请求，
+    # 省去每次请求的握手开销。所有响应都带Content-Length，
+    # 这是keep-alive下客户端判断响应边界的前提
+    protocol_version = 'HTTP/1.1'
+
+    # 默认wfile不带缓冲，状态行、响应头、响应体各是一次socket写；
+    # 开启写缓冲后整个响应在用户态攒齐，刷新时一次写出
+    wbufsize = 64 * 1024
+
     generator = PDFBookmarkGenerator()
+    # 服务器按连接开线程，generator是各线程共享的同一个实例，
+    # 修改其状态时持有这把锁，避免并发请求互相踩踏
+    generator_lock = threading.Lock()
+
+    # /check_file被前端轮询，结果短暂缓存，不必每次都访问磁盘
+    _CHECK_FILE_TTL = 1.0
+    _check_file_at = 0.0
+    _check_file_result = False
+
+    # 当前请求体还剩多少字节没读（keep-alive下必须清空才能处理下一条请求）
+    _body_remaining = 0
+
+    # 后台生成任务表：job_id -> {'status': 'running'|'done'|'error', 'message': ...}
+    _jobs = {}
+    _jobs_lock = threading.Lock()
+
+    def _send_json(self, data, status=200):
+        """序列化并发送JSON响应
+        统一各接口重复的响应样板，序列化走orjson（无则退回标准库json），
+        并带上Content-Length
+        """
+        body = _dump_json_bytes(data, indent=False)
+        # 超过1KB的响应按客户端声明做gzip：书签列表这类大payload
+        # 压缩率很高，级别1的CPU开销相对网络传输可以忽略；
+        # 小响应不压，省去得不偿失的压缩头开销
+        gzip_ok = (len(body) > 1024
+                   and 'gzip' in self.headers.get('Accept-Encoding', ''))
+        if gzip_ok:
+            body = gzip.compress(body, compresslevel=1)
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        if gzip_ok:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # 每个工作线程常驻一块读缓冲，接口的小JSON请求体直接复用它
+    _READ_BUF_SIZE = 64 * 1024
+    _tls = threading.local()
+
+    def _read_json_body(self):
+        """按Content-Length把请求体读进线程私有的缓冲并解析为JSON
+
+        readinto直接写入现成缓冲，不产生read()的中间bytes对象；
+        缓冲挂在threading.local上跨请求复用，常规请求体（偏移、
+        移动、页码范围等都在几十字节到几KB）零分配，超过64KB的
+        大请求体才临时开一块一次性缓冲
+        """
+        length = int(self.headers.get('Content-Length', 0))
+        buf = getattr(self._tls, 'buf', None)
+        if buf is None and length <= self._READ_BUF_SIZE:
+            buf = self._tls.buf = bytearray(self._READ_BUF_SIZE)
+        if buf is None or length > len(buf):
+            buf = bytearray(length)
+        view = memoryview(buf)[:length]
+        offset = 0
+        while offset < length:
+            read = self.rfile.readinto(view[offset:])
+            if not read:
+                break
+            offset += read
+        self._body_remaining = max(0, self._body_remaining - offset)
+        return _load_json_bytes(view[:offset])
+
+    # 上传流式解析的读块大小
+    _UPLOAD_CHUNK = 64 * 1024
+
+    @staticmethod
+    def _parse_disposition_filename(part_headers):
+        """从part头部的Content-Disposition行里取出文件名"""
+        for line in part_headers.split('\r\n'):
+            if not line.lower().startswith('content-disposition'):
+                continue
+            for item in line.split(';'):
+                item = item.strip()
+                if item.startswith('filename='):
+                    return item[len('filename='):].strip().strip('"')
+        return None
+
+    def _stream_multipart_file(self, field_name, path_for):
+        """流式解析multipart请求体，把目标文件字段直接写到磁盘
+
+        请求体不再整个读进内存：按块扫描boundary，目标字段的内容
+        边读边写入path_for(文件名)给出的路径，峰值内存只占一个读块，
+        与PDF大小无关。返回(文件名, 保存路径)，找不到字段时返回(None, None)
+        """
+        content_type = self.headers.get('Content-Type', '')
+        if 'boundary=' not in content_type:
+            return None, None
+        boundary = content_type.split('boundary=')[-1].split(';')[0].strip('"')
+        delimiter = b'\r\n--' + boundary.encode('latin-1')
+        remaining = int(self.headers.get('Content-Length', 0))
+
+        def read_chunk():
+            nonlocal remaining
+            if remaining <= 0:
+                return b''
+            chunk = self.rfile.read(min(self._UPLOAD_CHUNK, remaining))
+            remaining -= len(chunk)
+            self._body_remaining = remaining
+            return chunk
+
+        buffer = b''
+        filename = None
+        while True:
+            # 攒出完整的part头部
+            head_end = buffer.find(b'\r\n\r\n')
+            while head_end == -1:
+                chunk = read_chunk()
+                if not chunk:
+                    return None, None
+                buffer += chunk
+                head_end = buffer.find(b'\r\n\r\n')
+
+            part_headers = buffer[:head_end].decode('utf-8', errors='replace')
+            buffer = buffer[head_end + 4:]
+
+            if f'name="{field_name}"' in part_headers:
+                filename = self._parse_disposition_filename(part_headers)
+                break
+
+            # 不是目标字段：丢弃内容，快进到下一个boundary
+            while True:
+                pos = buffer.find(delimiter)
+                if pos != -1:
+                    buffer = buffer[pos + len(delimiter):]
+                    break
+                keep = len(delimiter) - 1
+                buffer = buffer[-keep:] if len(buffer) > keep else buffer
+                chunk = read_chunk()
+                if not chunk:
+                    return None, None
+                buffer += chunk
+
+        if not filename:
+            return None, None
+
+        file_path = path_for(filename)
+        with open(file_path, 'wb') as out:
+            while True:
+                pos = buffer.find(delimiter)
+                if pos != -1:
+                    out.write(buffer[:pos])
+                    break
+                # boundary可能被读块切开，结尾留出boundary长度的余量
+                keep = len(delimiter) - 1
+                if len(buffer) > keep:
+                    out.write(buffer[:-keep])
+                    buffer = buffer[-keep:]
+                chunk = read_chunk()
+                if not chunk:
+                    out.write(buffer)
+                    break
+                buffer += chunk
+        return filename, file_path
 
     def do_GET(self):
-        if self.path == '/':
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html; charset=utf-8')
+        route = self._GET_ROUTES.get(self.path)
+        if route is not None:
+            route(self)
+            return
+        # 带路径参数的前缀路由
+        for prefix, handler in self._GET_PREFIX_ROUTES:
+            if self.path.startswith(prefix):
+                handler(self)
+                return
+        self.send_error(404)
+
+    def do_POST(self):
+        route = self._POST_ROUTES.get(self.path)
+        if route is None:
+            self.send_error(404)
+            return
+        self._body_remaining = int(self.headers.get('Content-Length', 0) or 0)
+        route(self)
+        self._drain_request_body()
+
+    def _drain_request_body(self):
+        """丢弃请求体中未被处理函数消费的字节
+
+        keep-alive连接上，残留的请求体会被误解析成下一条请求的起始行
+        """
+        remaining = self._body_remaining
+        while remaining > 0:
+            chunk = self.rfile.read(min(self._UPLOAD_CHUNK, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+        self._body_remaining = 0
+
+    # ------------------------------------------------------------------
+    # GET 路由
+    # ------------------------------------------------------------------
+
+    def _get_index(self):
+        """主页面"""
+        body = _HTML_BYTES
+        gzip_ok = 'gzip' in self.headers.get('Accept-Encoding', '')
+        if gzip_ok:
+            body = _HTML_GZIP
+        self.send_response(200)
+        self.send_header('Content-type', 'text/html; charset=utf-8')
+        if gzip_ok:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _get_static(self):
+        """静态资源：URL带内容指纹，可以放心给长缓存；
+        命中If-None-Match时直接304，不传任何字节
+        """
+        asset_name = self.path[len('/static/'):].split('?', 1)[0]
+        asset = _STATIC_ASSETS.get(asset_name)
+        if asset is None:
+            self.send_error(404)
+            return
+
+        if self.headers.get('If-None-Match') == _ASSET_ETAG:
+            self.send_response(304)
+            self.send_header('ETag', _ASSET_ETAG)
             self.end_headers()
+            return
 
-            html_content = '''
-<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>PDF书签生成器</title>
-    <style>
-        body { font-family: Arial, sans-serif; margin: 20px; }
-        .container { max-width: 1000px; margin: 0 auto; }
-        h1 { color: #333; }
-        .section { margin-bottom: 30px; padding: 20px; border: 1px solid #ddd; border-radius: 5px; }
-        label { display: block; margin-bottom: 5px; font-weight: bold; }
-        input, textarea, select { width: 100%; padding: 8px; margin-bottom: 15px; box-sizing: border-box; }
-        button { background-color: #4CAF50; color: white; padding: 10px 15px; border: none; border-radius: 4px; cursor: pointer; margin-right: 10px; margin-bottom: 10px; }
-        button:hover { background-color: #45a049; }
-        .btn-danger { background-color: #f44336; }
-        .btn-danger:hover { background-color: #da190b; }
-        .btn-secondary { background-color: #008CBA; }
-        .btn-secondary:hover { background-color: #007B9A; }
-        .btn-warning { background-color: #ff9800; }
-        .btn-warning:hover { background-color: #e68a00; }
-        .btn-info { background-color: #17a2b8; }
-        .btn-info:hover { background-color: #138496; }
-        .btn-primary { background-color: #007bff; }
-        .btn-primary:hover { background-color: #0069d9; }
-        .btn-dark { background-color: #343a40; }
-        .btn-dark:hover { background-color: #23272b; }
-        table { width: 100%; border-collapse: collapse; margin-top: 15px; }
-        th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
-        th { background-color: #f2f2f2; }
-        .toc-image-container { 
-            max-height: 400px; 
-            overflow-y: auto; 
-            border: 1px solid #ccc; 
-            padding: 10px; 
-            margin-top: 15px;
-            text-align: center;
-        }
-        .toc-image { max-width: 100%; }
-        .actions { margin: 10px 0; }
-        .status { padding: 10px; margin: 10px 0; border-radius: 4px; }
-        .status-success { background-color: #dff0d8; color: #3c763d; }
-        .status-error { background-color: #f2dede; color: #a94442; }
-        .status-info { background-color: #d9edf7; color: #31708f; }
-        .hidden { display: none; }
-        .offset-display { 
-            background-color: #e9ecef; 
-            padding: 10px; 
-            border-radius: 4px; 
-            margin-bottom: 15px; 
-            font-weight: bold;
-        }
-        .bookmark-row {
-            cursor: move;
-        }
-        .bookmark-row.dragging {
-            opacity: 0.5;
-            background-color: #f0f0f0;
-        }
-        .level-select {
-            width: auto;
-            min-width: 80px;
-            padding: 4px;
-        }
-        .page-input {
-            width: 80px;
-        }
-        .title-input {
-            width: 100%;
-        }
-        .preview-section {
-            background-color: #f8f9fa;
-            padding: 15px;
-            border-radius: 5px;
-            margin-top: 15px;
-        }
-        .bookmarks-container {
-            max-height: 500px;
-            overflow-y: auto;
-            border: 1px solid #ddd;
-            padding: 10px;
-        }
-        .page-info {
-            font-size: 0.9em;
-            color: #666;
-        }
-        .notification {
-            position: fixed;
-            top: 20px;
-            right: 20px;
-            padding: 15px;
-            border-radius: 4px;
-            color: white;
-            z-index: 1000;
-            opacity: 0.9;
-            transition: opacity 0.3s;
-        }
-        .notification-success {
-            background-color: #28a745;
-        }
-        .notification-error {
-            background-color: #dc3545;
-        }
-        .notification-info {
-            background-color: #17a2b8;
-        }
-        .batch-edit-section {
-            background-color: #fff3cd;
-            padding: 15px;
-            border-radius: 5px;
-            margin-top: 15px;
-            border: 1px solid #ffeaa7;
-        }
-        .draft-indicator {
-            background-color: #d4edda;
-            color: #155724;
-            padding: 10px;
-            border-radius: 4px;
-            margin-bottom: 15px;
-            display: none;
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>PDF书签生成器 Beta</h1>
-        <div class="draft-indicator" id="draftIndicator">
-            检测到草稿文件，已自动加载上次的工作进度
-        </div>
-        <div class="page-info">
-            <p><strong>页码说明：</strong>用户输入的页码为PDF显示页码（1基索引），系统会自动转换为PDF内部索引（0基索引）</p>
-        </div>
-        
-        <!-- 文件上传部分 -->
-        <div class="section">
-            <h2>1. 上传PDF文件</h2>
-            <form id="uploadForm" enctype="multipart/form-data">
-                <label for="pdfFile">选择PDF文件:</label>
-                <input type="file" id="pdfFile" name="pdfFile" accept=".pdf" required>
-                <button type="submit">上传PDF</button>
-                <button type="button" id="deleteFileBtn" class="btn-danger hidden" onclick="deleteUploadedFile()">删除已上传文件</button>
-            </form>
-            <div id="uploadStatus"></div>
-        </div>
-        
-        <!-- 目录页提取部分 -->
-        <div class="section">
-            <h2>2. 提取目录页（可选）</h2>
-            <label for="tocStartPage">目录起始页:</label>
-            <input type="number" id="tocStartPage" min="1" value="1">
-            
-            <label for="tocEndPage">目录结束页:</label>
-            <input type="number" id="tocEndPage" min="1" value="1">
-            
-            <button onclick="updateTocPages()" class="btn-warning">更新目录页范围</button>
-            <button onclick="extractTocPages()">提取目录页</button>
-            <button onclick="openQwen()" class="btn-info">使用通义千问识别目录</button>
-            <div>
-                <div style="display: flex; align-items: center;">
-                    <div style="flex-grow: 1;">
-                        <div style="font-weight: bold;">推荐提示词：</div>
-                        <div id="promptContainer" style="max-height: 100px; overflow-y: auto; border: 1px solid #ccc; padding: 10px; background-color: #f9f9f9;">
-请分析这个PDF文档的目录页，并按照以下要求输出目录结构：<br><br>
-
-1. 保留完整的层级结构信息，使用缩进或编号方式表示层级关系<br>
-2. 每行输出一个目录项，格式为："标题内容 ...................... 页码"（页码前的点线为可选）<br>
-3. 对于缺失页码的条目，请根据上下文逻辑推断并补充完整页码<br>
-4. 支持多种标题格式：<br>
-&nbsp;&nbsp;&nbsp;- 章节编号格式：如"第1章 绪论"、"1.1 背景介绍"<br>
-&nbsp;&nbsp;&nbsp;- Markdown格式：使用#符号表示层级<br>
-&nbsp;&nbsp;&nbsp;- 缩进格式：通过空格或制表符表示层级<br>
-&nbsp;&nbsp;&nbsp;- 中文序数格式：如"一、"、"1."、"（一）"等<br>
-5. 保持原始层级结构，不要改变标题内容<br>
-6. 输出时不要包含任何解释性文字，只输出目录内容本身<br><br>
-
-示例输出格式：<br>
-# 第一章 绪论 1<br>
-## 1.1 研究背景 1<br>
-## 1.2 研究意义 3<br>
-# 第二章 文献综述 5<br>
-## 2.1 国内研究现状 5<br>
-## 2.2 国外研究现状 8<br>
-                        </div>
-                    </div>
-                    <div style="margin-left: 10px;">
-                        <button onclick="copyPrompt()" class="btn-secondary">复制提示词</button>
-                    </div>
-                </div>
-            </div>
-            <div id="tocImageContainer"></div>
-        </div>
-        
-        <!-- 目录输入部分 -->
-        <div class="section">
-            <h2>3. 输入目录文本</h2>
-            <label for="tocText">粘贴目录内容:</label>
-            <textarea id="tocText" rows="10" placeholder="在此粘贴目录内容&#10;支持格式示例:&#10;章节1 标题 ...................... 1&#10;2 第二章 标题&#10;# 第一章 标题 5&#10;* 第一节 标题 10&#10;## 1.1 第一节标题 10"></textarea>
-            <button onclick="parseTocText()">解析目录</button>
-            <button onclick="previewParseResult()" class="btn-info">预览解析结果</button>
-            <div id="parseStatus"></div>
-            <div id="parsePreview" class="preview-section" style="display: none;"></div>
-        </div>
-        
-        <!-- 参数设置部分 -->
-        <div class="section">
-            <h2>4. 设置参数</h2>
-            <div class="offset-display">
-                <strong>当前使用的偏移量:</strong> <span id="currentOffset">0</span>
-            </div>
-            
-            <label for="contentStartPage">正文起始页:</label>
-            <input type="number" id="contentStartPage" min="1" value="1">
-            
-            <button onclick="calculateAndApplyOffset()">计算并应用偏移量</button>
-            
-            <label for="manualOffset">手动设置偏移量:</label>
-            <input type="number" id="manualOffset" value="0">
-            <button onclick="applyManualOffset()">应用手动偏移量</button>
-            
-            <div class="preview-section">
-                <h3>偏移量预览</h3>
-                <p>应用偏移量后，将更新书签编辑器中的PDF页码列（实际页码 = 原始页码 + 偏移量）</p>
-                <button onclick="previewOffsetChanges()">预览偏移量变化</button>
-                <div id="offsetPreview"></div>
-            </div>
-            
-            <label for="outputFileName">输出文件名:</label>
-            <input type="text" id="outputFileName" value="">
-        </div>
-        
-        <!-- 书签编辑部分 -->
-        <div class="section">
-            <h2>5. 编辑书签</h2>
-            <div class="actions">
-                <button onclick="addBookmarkBeforeSelected()">在选中行前添加书签</button>
-                <button onclick="addBookmark()">添加书签到末尾</button>
-                <button onclick="saveBookmarks()">保存修改</button>
-                <button class="btn-danger" onclick="deleteSelectedBookmarks()">删除选中书签</button>
-                <button class="btn-warning" onclick="moveSelectedUp()">上移</button>
-                <button class="btn-warning" onclick="moveSelectedDown()">下移</button>
-                <button onclick="invertSelection()">反选</button>
-            </div>
-            <div class="bookmarks-container">
-                <table id="bookmarksTable">
-                    <thead>
-                        <tr>
-                            <th><input type="checkbox" id="selectAll" onchange="toggleSelectAll()"></th>
-                            <th>层级</th>
-                            <th>标题</th>
-                            <th>原始页码</th>
-                            <th>PDF页码</th>
-                            <th>操作</th>
-                        </tr>
-                    </thead>
-                    <tbody id="bookmarksTableBody">
-                        <!-- 书签将在这里动态生成 -->
-                    </tbody>
-                </table>
-            </div>
-        </div>
-        
-        <!-- 生成PDF部分 -->
-        <div class="section">
-            <h2>6. 生成PDF</h2>
-            <button class="btn-secondary" onclick="generatePdf()">生成PDF</button>
-            <button class="btn-danger" onclick="exitApplication()">退出程序</button>
-            <div id="generationStatus"></div>
-        </div>
-    </div>
-
-    <script>
-        let draggedRow = null;
-        
-        // 解析目录文本
-        function parseTocText() {
-            const tocText = document.getElementById('tocText').value;
-            fetch('/parse_toc', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({toc_text: tocText})
-            })
-            .then(response => response.json())
-            .then(data => {
-                const statusDiv = document.getElementById('parseStatus');
-                if (data.status === 'success') {
-                    renderBookmarks(data.bookmarks, data.original_bookmarks);
-                    showNotification('目录解析成功，共识别到 ' + data.bookmarks.length + ' 个条目', 'success');
-                    // 清空状态区域
-                    statusDiv.innerHTML = '';
-                    // 保存解析结果用于预览
-                    window.lastParseResult = data;
-                } else {
-                    showNotification('解析失败: ' + data.message, 'error');
-                }
-            })
-            .catch(error => {
-                showNotification('解析出错: ' + error, 'error');
-            });
-        }
-        
-        // 预览解析结果
-        function previewParseResult() {
-            if (!window.lastParseResult || window.lastParseResult.status !== 'success') {
-                showNotification('请先解析目录', 'error');
-                return;
-            }
-            
-            const data = window.lastParseResult;
-            const previewDiv = document.getElementById('parsePreview');
-            
-            let html = `
-                <h3>目录解析结果报告</h3>
-                <p><strong>解析状态:</strong> 成功</p>
-                <p><strong>识别条目数:</strong> ${data.bookmarks.length} 个</p>
-                
-                <h4>详细信息:</h4>
-                <table style="width: 100%; border-collapse: collapse;">
-                    <thead>
-                        <tr style="background-color: #f2f2f2;">
-                            <th style="border: 1px solid #ddd; padding: 8px; text-align: left;">层级</th>
-                            <th style="border: 1px solid #ddd; padding: 8px; text-align: left;">标题</th>
-                            <th style="border: 1px solid #ddd; padding: 8px; text-align: left;">原始页码</th>
-                            <th style="border: 1px solid #ddd; padding: 8px; text-align: left;">PDF页码</th>
-                        </tr>
-                    </thead>
-                    <tbody>`;
-            
-            data.bookmarks.forEach((bookmark, index) => {
-                const originalPage = data.original_bookmarks[index] ? data.original_bookmarks[index].page : null;
-                html += `
-                    <tr>
-                        <td style="border: 1px solid #ddd; padding: 8px;">${bookmark.level}</td>
-                        <td style="border: 1px solid #ddd; padding: 8px;">${escapeHtml(bookmark.title)}</td>
-                        <td style="border: 1px solid #ddd; padding: 8px;">${originalPage || '无'}</td>
-                        <td style="border: 1px solid #ddd; padding: 8px;">${bookmark.page || '无'}</td>
-                    </tr>`;
-            });
-            
-            html += `
-                    </tbody>
-                </table>
-                <button onclick="this.parentElement.style.display='none'" class="btn-danger" style="margin-top: 10px;">关闭预览</button>
-            `;
-            
-            previewDiv.innerHTML = html;
-            previewDiv.style.display = 'block';
-        }
-        
-        // 渲染书签表格
-        function renderBookmarks(bookmarks, originalBookmarks = null) {
-            const tbody = document.querySelector('#bookmarksTable tbody');
-            tbody.innerHTML = '';
-            
-            // 如果没有提供原始书签，则使用当前书签作为原始书签
-            if (!originalBookmarks) {
-                originalBookmarks = bookmarks;
-            }
-            
-            bookmarks.forEach((bookmark, index) => {
-                const originalPage = originalBookmarks[index] ? originalBookmarks[index].page : null;
-                const row = document.createElement('tr');
-                row.className = 'bookmark-row';
-                row.draggable = true;
-                row.innerHTML = `
-                    <td><input type="checkbox" class="bookmark-select" data-index="${index}"></td>
-                    <td>
-                        <select class="level-select" id="level_${index}" onchange="onLevelChange(this)">
-                            <option value="0">级别0</option>
-                            <option value="1">级别1</option>
-                            <option value="2">级别2</option>
-                            <option value="3">级别3</option>
-                        </select>
-                    </td>
-                    <td><input type="text" class="title-input" id="title_${index}" value="${escapeHtml(bookmark.title)}"></td>
-                    <td>${originalPage || ''}</td>
-                    <td><input type="number" class="page-input" id="page_${index}" value="${bookmark.page || ''}"></td>
-                    <td>
-                        <button class="btn-danger" onclick="removeBookmark(this)">删除</button>
-                    </td>
-                `;
-                
-                // 添加拖拽事件
-                row.addEventListener('dragstart', handleDragStart);
-                row.addEventListener('dragover', handleDragOver);
-                row.addEventListener('drop', handleDrop);
-                row.addEventListener('dragend', handleDragEnd);
-                
-                tbody.appendChild(row);
-            });
-            
-            // 在所有行添加完毕后再设置层级选择
-            setTimeout(() => {
-                bookmarks.forEach((bookmark, index) => {
-                    // 设置层级选择
-                    const levelSelect = document.getElementById(`level_${index}`);
-                    if (levelSelect) {
-                        levelSelect.value = bookmark.level;
-                    }
-                });
-            }, 0);
-            
-            // 更新索引
-            updateBookmarkIndices();
-        }
-        
-        // 转义HTML特殊字符
-        function escapeHtml(text) {
-            const map = {
-                '&': '&amp;',
-                '<': '&lt;',
-                '>': '&gt;',
-                '"': '&quot;',
-                "'": '&#039;'
-            };
-            return text.replace(/[&<>"']/g, function(m) { return map[m]; });
-        }
-        
-        // 层级选择变化事件
-        function onLevelChange(selectElement) {
-            // 获取当前行的索引
-            const rowIndex = parseInt(selectElement.id.split('_')[1]);
-            
-            // 检查是否有其他选中的行
-            const checkboxes = document.querySelectorAll('.bookmark-select:checked');
-            if (checkboxes.length > 1) {
-                // 如果有多个选中项，询问是否应用到所有选中项
-                if (confirm(`是否将层级 ${selectElement.value} 应用到所有选中的 ${checkboxes.length} 个书签？`)) {
-                    checkboxes.forEach(checkbox => {
-                        const index = parseInt(checkbox.dataset.index);
-                        const levelSelect = document.getElementById(`level_${index}`);
-                        if (levelSelect && index !== rowIndex) {
-                            levelSelect.value = selectElement.value;
-                        }
-                    });
-                }
-            }
-        }
-        
-        // 拖拽开始
-        function handleDragStart(e) {
-            draggedRow = this;
-            this.classList.add('dragging');
-            e.dataTransfer.effectAllowed = 'move';
-            e.dataTransfer.setData('text/html', this.innerHTML);
-        }
-        
-        // 拖拽经过
-        function handleDragOver(e) {
-            e.preventDefault();
-            e.dataTransfer.dropEffect = 'move';
-            
-            const tbody = document.querySelector('#bookmarksTable tbody');
-            const rows = Array.from(tbody.querySelectorAll('.bookmark-row'));
-            const draggingRow = rows.find(row => row.classList.contains('dragging'));
-            const targetRow = e.target.closest('.bookmark-row');
-            
-            if (targetRow && targetRow !== draggingRow) {
-                const bounding = targetRow.getBoundingClientRect();
-                const offset = bounding.y + (bounding.height / 2);
-                
-                if (e.clientY <= offset) {
-                    tbody.insertBefore(draggingRow, targetRow);
-                } else {
-                    tbody.insertBefore(draggingRow, targetRow.nextSibling);
-                }
-            }
-        }
-        
-        // 拖拽放下
-        function handleDrop(e) {
-            e.preventDefault();
-            return false;
-        }
-        
-        // 拖拽结束
-        function handleDragEnd() {
-            this.classList.remove('dragging');
-            draggedRow = null;
-            
-            // 更新索引
-            updateBookmarkIndices();
-        }
-        
-        // 更新书签索引
-        function updateBookmarkIndices() {
-            const rows = document.querySelectorAll('#bookmarksTable tbody tr');
-            rows.forEach((row, index) => {
-                const checkbox = row.querySelector('.bookmark-select');
-                const levelSelect = row.querySelector('select');
-                const titleInput = row.querySelector('input[type="text"]');
-                const pageInput = row.querySelector('input[type="number"]');
-                
-                if (checkbox) checkbox.dataset.index = index;
-                if (levelSelect) levelSelect.id = `level_${index}`;
-                if (titleInput) titleInput.id = `title_${index}`;
-                if (pageInput) pageInput.id = `page_${index}`;
-            });
-        }
-        
-        // 添加书签到末尾
-        function addBookmark() {
-            const tbody = document.querySelector('#bookmarksTable tbody');
-            const rowCount = tbody.children.length;
-            
-            const row = document.createElement('tr');
-            row.className = 'bookmark-row';
-            row.draggable = true;
-            row.innerHTML = `
-                <td><input type="checkbox" class="bookmark-select" data-index="${rowCount}"></td>
-                <td>
-                    <select class="level-select" id="level_${rowCount}" onchange="onLevelChange(this)">
-                        <option value="0" selected>级别0</option>
-                        <option value="1">级别1</option>
-                        <option value="2">级别2</option>
-                        <option value="3">级别3</option>
-                    </select>
-                </td>
-                <td><input type="text" class="title-input" id="title_${rowCount}" value=""></td>
-                <td></td>
-                <td><input type="number" class="page-input" id="page_${rowCount}" value=""></td>
-                <td>
-                    <button class="btn-danger" onclick="removeBookmark(this)">删除</button>
-                </td>
-            `;
-            
-            // 添加拖拽事件
-            row.addEventListener('dragstart', handleDragStart);
-            row.addEventListener('dragover', handleDragOver);
-            row.addEventListener('drop', handleDrop);
-            row.addEventListener('dragend', handleDragEnd);
-            
-            tbody.appendChild(row);
-            updateBookmarkIndices();
-        }
-        
-        // 在选中行前添加书签
-        function addBookmarkBeforeSelected() {
-            const checkboxes = document.querySelectorAll('.bookmark-select:checked');
-            
-            if (checkboxes.length === 0) {
-                // 没有选中行，添加到末尾
-                addBookmark();
-                return;
-            }
-            
-            if (checkboxes.length > 1) {
-                showNotification('请只选择一个位置来插入书签', 'error');
-                return;
-            }
-            
-            const selectedIndex = parseInt(checkboxes[0].dataset.index);
-            const tbody = document.querySelector('#bookmarksTable tbody');
-            
-            const row = document.createElement('tr');
-            row.className = 'bookmark-row';
-            row.draggable = true;
-            row.innerHTML = `
-                <td><input type="checkbox" class="bookmark-select" data-index="${selectedIndex}"></td>
-                <td>
-                    <select class="level-select" id="level_${selectedIndex}" onchange="onLevelChange(this)">
-                        <option value="0" selected>级别0</option>
-                        <option value="1">级别1</option>
-                        <option value="2">级别2</option>
-                        <option value="3">级别3</option>
-                    </select>
-                </td>
-                <td><input type="text" class="title-input" id="title_${selectedIndex}" value=""></td>
-                <td></td>
-                <td><input type="number" class="page-input" id="page_${selectedIndex}" value=""></td>
-                <td>
-                    <button class="btn-danger" onclick="removeBookmark(this)">删除</button>
-                </td>
-            `;
-            
-            // 添加拖拽事件
-            row.addEventListener('dragstart', handleDragStart);
-            row.addEventListener('dragover', handleDragOver);
-            row.addEventListener('drop', handleDrop);
-            row.addEventListener('dragend', handleDragEnd);
-            
-            // 插入到选中行之前
-            const selectedRow = tbody.children[selectedIndex];
-            tbody.insertBefore(row, selectedRow);
-            updateBookmarkIndices();
-        }
-        
-        // 删除书签
-        function removeBookmark(button) {
-            const row = button.closest('tr');
-            if (row) {
-                row.remove();
-                updateBookmarkIndices();
-            }
-        }
-        
-        // 保存书签修改
-        function saveBookmarks() {
-            const rows = document.querySelectorAll('#bookmarksTable tbody tr');
-            const bookmarks = [];
-            
-            rows.forEach((row, index) => {
-                const level = document.getElementById(`level_${index}`).value;
-                const title = document.getElementById(`title_${index}`).value;
-                const page = document.getElementById(`page_${index}`).value;
-                
-                bookmarks.push({
-                    level: parseInt(level),
-                    title: title,
-                    page: page ? parseInt(page) : null
-                });
-            });
-            
-            fetch('/save_bookmarks', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({bookmarks: bookmarks})
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.status === 'success') {
-                    showNotification('书签保存成功', 'success');
-                } else {
-                    showNotification('保存失败: ' + data.message, 'error');
-                }
-            })
-            .catch(error => {
-                showNotification('保存出错: ' + error, 'error');
-            });
-        }
-        
-        // 全选/取消全选
-        function toggleSelectAll() {
-            const selectAll = document.getElementById('selectAll');
-            const checkboxes = document.querySelectorAll('.bookmark-select');
-            
-            checkboxes.forEach(checkbox => {
-                checkbox.checked = selectAll.checked;
-            });
-        }
-        
-        // 反选
-        function invertSelection() {
-            const checkboxes = document.querySelectorAll('.bookmark-select');
-            checkboxes.forEach(checkbox => {
-                checkbox.checked = !checkbox.checked;
-            });
-            // 更新全选框状态
-            const allChecked = Array.from(checkboxes).every(cb => cb.checked);
-            document.getElementById('selectAll').checked = allChecked;
-        }
-        
-        // 删除选中的书签
-        function deleteSelectedBookmarks() {
-            const checkboxes = document.querySelectorAll('.bookmark-select:checked');
-            if (checkboxes.length === 0) {
-                showNotification('请先选择要删除的书签', 'error');
-                return;
-            }
-            
-            if (confirm(`确定要删除选中的 ${checkboxes.length} 个书签吗？`)) {
-                // 从后往前删除，避免索引变化
-                const indices = Array.from(checkboxes)
-                    .map(cb => parseInt(cb.dataset.index))
-                    .sort((a, b) => b - a);
-                
-                indices.forEach(index => {
-                    removeBookmark(index);
-                });
-                
-                // 重置全选按钮
-                document.getElementById('selectAll').checked = false;
-                showNotification(`已删除 ${checkboxes.length} 个书签`, 'success');
-            }
-        }
-        
-        // 上移选中的书签
-        function moveSelectedUp() {
-            const checkboxes = document.querySelectorAll('.bookmark-select:checked');
-            if (checkboxes.length === 0) {
-                showNotification('请先选择要移动的书签', 'error');
-                return;
-            }
-            
-            // 获取选中项的索引并排序
-            const indices = Array.from(checkboxes)
-                .map(cb => parseInt(cb.dataset.index))
-                .sort((a, b) => a - b);
-            
-            // 检查是否可以移动（第一个不能移到-1位置）
-            if (indices[0] === 0) {
-                showNotification('已到顶部，无法继续上移', 'error');
-                return;
-            }
-            
-            // 发送到服务器进行移动
-            fetch('/move_bookmark', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({indices: indices, direction: 'up'})
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.status === 'success') {
-                    renderBookmarks(data.bookmarks, data.original_bookmarks);
-                    showNotification(`已上移 ${indices.length} 个书签`, 'success');
-                } else {
-                    showNotification('移动失败: ' + data.message, 'error');
-                }
-            })
-            .catch(error => {
-                showNotification('移动出错: ' + error, 'error');
-            });
-        }
-        
-        // 下移选中的书签
-        function moveSelectedDown() {
-            const checkboxes = document.querySelectorAll('.bookmark-select:checked');
-            if (checkboxes.length === 0) {
-                showNotification('请先选择要移动的书签', 'error');
-                return;
-            }
-            
-            const totalRows = document.querySelectorAll('#bookmarksTable tbody tr').length;
-            
-            // 获取选中项的索引并排序（降序）
-            const indices = Array.from(checkboxes)
-                .map(cb => parseInt(cb.dataset.index))
-                .sort((a, b) => b - a);
-            
-            // 检查是否可以移动（最后一个不能移到length位置）
-            if (indices[0] === totalRows - 1) {
-                showNotification('已到底部，无法继续下移', 'error');
-                return;
-            }
-            
-            // 发送到服务器进行移动
-            fetch('/move_bookmark', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({indices: indices, direction: 'down'})
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.status === 'success') {
-                    renderBookmarks(data.bookmarks, data.original_bookmarks);
-                    showNotification(`已下移 ${indices.length} 个书签`, 'success');
-                } else {
-                    showNotification('移动失败: ' + data.message, 'error');
-                }
-            })
-            .catch(error => {
-                showNotification('移动出错: ' + error, 'error');
-            });
-        }
-        
-        // 计算并应用偏移量
-        function calculateAndApplyOffset() {
-            const contentStartPage = document.getElementById('contentStartPage').value;
-            // 根据新公式计算偏移量: 偏移量 = 正文起始页 - 1
-            const offset = parseInt(contentStartPage) - 1;
-            
-            document.getElementById('currentOffset').textContent = offset;
-            
-            fetch('/apply_offset', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({offset: offset, type: 'calculated'})
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.status === 'success') {
-                    renderBookmarks(data.bookmarks, data.original_bookmarks);
-                    document.getElementById('currentOffset').textContent = data.offset;
-                    showNotification(`偏移量已计算并应用: ${offset}`, 'success');
-                } else {
-                    showNotification('应用偏移量失败: ' + data.message, 'error');
-                }
-            })
-            .catch(error => {
-                showNotification('应用偏移量出错: ' + error, 'error');
-            });
-        }
-        
-        // 应用手动偏移量
-        function applyManualOffset() {
-            const offset = parseInt(document.getElementById('manualOffset').value);
-            document.getElementById('currentOffset').textContent = offset;
-            
-            fetch('/apply_offset', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({offset: offset, type: 'manual'})
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.status === 'success') {
-                    renderBookmarks(data.bookmarks, data.original_bookmarks);
-                    document.getElementById('currentOffset').textContent = data.offset;
-                    showNotification(`手动偏移量已应用: ${offset}`, 'success');
-                } else {
-                    showNotification('应用偏移量失败: ' + data.message, 'error');
-                }
-            })
-            .catch(error => {
-                showNotification('应用偏移量出错: ' + error, 'error');
-            });
-        }
-        
-        // 预览偏移量变化
-        function previewOffsetChanges() {
-            const offset = parseInt(document.getElementById('currentOffset').textContent) || 0;
-            fetch('/preview_offset', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({offset: offset})
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.status === 'success') {
-                    const previewDiv = document.getElementById('offsetPreview');
-                    let html = '<h4>偏移量应用预览:</h4><ul>';
-                    data.changes.forEach(change => {
-                        html += `<li>${escapeHtml(change.title)}: ${change.original_page || '无页码'} → ${change.new_page || '无页码'}</li>`;
-                    });
-                    html += '</ul>';
-                    previewDiv.innerHTML = html;
-                } else {
-                    showNotification('预览失败: ' + data.message, 'error');
-                }
-            })
-            .catch(error => {
-                showNotification('预览出错: ' + error, 'error');
-            });
-        }
-        
-        // 提取目录页
-        function extractTocPages() {
-            fetch('/extract_toc', {
-                method: 'POST'
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.status === 'success' && data.image_url) {
-                    document.getElementById('tocImageContainer').innerHTML = 
-                        `<div class="toc-image-container"><img src="${data.image_url}" class="toc-image" alt="目录页"></div>`;
-                    showNotification('目录页提取成功', 'success');
-                } else {
-                    showNotification('目录页提取失败: ' + (data.message || '未知错误'), 'error');
-                }
-            })
-            .catch(error => {
-                showNotification('目录页提取出错: ' + error, 'error');
-            });
-        }
-        
-        // 更新目录页范围
-        function updateTocPages() {
-            const tocStartPage = document.getElementById('tocStartPage').value;
-            const tocEndPage = document.getElementById('tocEndPage').value;
-            
-            fetch('/update_toc_pages', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({
-                    toc_start_page: parseInt(tocStartPage),
-                    toc_end_page: parseInt(tocEndPage)
-                })
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.status === 'success') {
-                    showNotification('目录页范围已更新', 'success');
-                } else {
-                    showNotification('更新目录页范围失败: ' + data.message, 'error');
-                }
-            })
-            .catch(error => {
-                showNotification('更新目录页范围出错: ' + error, 'error');
-            });
-        }
-        
-        // 生成PDF
-        function generatePdf() {
-            const outputFileName = document.getElementById('outputFileName').value;
-            
-            fetch('/generate_pdf', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({output_filename: outputFileName})
-            })
-            .then(response => response.json())
-            .then(data => {
-                const statusDiv = document.getElementById('generationStatus');
-                if (data.status === 'success') {
-                    statusDiv.innerHTML = `<div class="status status-success">PDF生成成功: ${data.message}</div>`;
-                    showNotification('PDF生成成功', 'success');
-                } else {
-                    statusDiv.innerHTML = `<div class="status status-error">PDF生成失败: ${data.message}</div>`;
-                    showNotification('PDF生成失败: ' + data.message, 'error');
-                }
-            })
-            .catch(error => {
-                document.getElementById('generationStatus').innerHTML = 
-                    `<div class="status status-error">PDF生成出错: ${error}</div>`;
-                showNotification('PDF生成出错: ' + error, 'error');
-            });
-        }
-        
-        // 删除已上传文件
-        function deleteUploadedFile() {
-            fetch('/delete_file', {
-                method: 'POST'
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.status === 'success') {
-                    document.getElementById('deleteFileBtn').classList.add('hidden');
-                    showNotification('文件已删除', 'success');
-                } else {
-                    showNotification('删除文件失败: ' + data.message, 'error');
-                }
-            })
-            .catch(error => {
-                showNotification('删除文件出错: ' + error, 'error');
-            });
-        }
-        
-        // 打开通义千问页面
-        function openQwen() {
-            window.open('https://tongyi.aliyun.com/', '_blank');
-        }
-        
-        // 退出应用程序
-        function exitApplication() {
-            if (confirm('确定要退出程序吗？这将关闭Web服务并清理所有临时文件。')) {
-                fetch('/exit', {
-                    method: 'POST'
-                })
-                .then(response => response.json())
-                .then(data => {
-                    if (data.status === 'success') {
-                        showNotification('程序已退出，您可以关闭此窗口', 'success');
-                        // 禁用页面上的所有按钮
-                        const buttons = document.querySelectorAll('button');
-                        buttons.forEach(button => {
-                            button.disabled = true;
-                        });
-                    } else {
-                        showNotification('退出失败: ' + data.message, 'error');
-                    }
-                })
-                .catch(error => {
-                    showNotification('退出时出错: ' + error, 'error');
-                });
-            }
-        }
-        
-        // 显示通知
-        function showNotification(message, type) {
-            // 创建通知div
-            const notification = document.createElement('div');
-            notification.className = `notification notification-${type}`;
-            notification.textContent = message;
-            
-            // 添加到页面
-            document.body.appendChild(notification);
-            
-            // 3秒后自动移除
-            setTimeout(() => {
-                if (notification.parentNode) {
-                    notification.parentNode.removeChild(notification);
-                }
-            }, 3000);
-        }
-        
-        // 处理PDF文件上传
-        document.getElementById('uploadForm').addEventListener('submit', function(e) {
-            e.preventDefault();
-            
-            const formData = new FormData();
-            const fileInput = document.getElementById('pdfFile');
-            const file = fileInput.files[0];
-            
-            // 设置默认输出文件名
-            const defaultOutputName = file.name.replace('.pdf', '') + '_bookmarked.pdf';
-            document.getElementById('outputFileName').value = defaultOutputName;
-            
-            formData.append('pdfFile', file);
-            
-            fetch('/upload', {
-                method: 'POST',
-                body: formData
-            })
-            .then(response => response.json())
-            .then(data => {
-                const statusDiv = document.getElementById('uploadStatus');
-                if (data.status === 'success') {
-                    statusDiv.innerHTML = '<div class="status status-success">文件上传成功: ' + data.filename + '</div>';
-                    document.getElementById('deleteFileBtn').classList.remove('hidden');
-                    showNotification('文件上传成功', 'success');
-                } else {
-                    statusDiv.innerHTML = '<div class="status status-error">上传失败: ' + data.message + '</div>';
-                    showNotification('上传失败: ' + data.message, 'error');
-                }
-            })
-            .catch(error => {
-                document.getElementById('uploadStatus').innerHTML = 
-                    '<div class="status status-error">上传出错: ' + error + '</div>';
-                showNotification('上传出错: ' + error, 'error');
-            });
-        });
-        
-        // 复制提示词到剪贴板
-        function copyPrompt() {
-            const promptText = `请分析这个PDF文档的目录页，并按照以下要求输出目录结构：
-
-1. 保留完整的层级结构信息，使用缩进或编号方式表示层级关系
-2. 每行输出一个目录项，格式为："标题内容 ...................... 页码"（页码前的点线为可选）
-3. 对于缺失页码的条目，请根据上下文逻辑推断并补充完整页码
-4. 支持多种标题格式：
-   - 章节编号格式：如"第1章 绪论"、"1.1 背景介绍"
-   - Markdown格式：使用#符号表示层级
-   - 缩进格式：通过空格或制表符表示层级
-   - 中文序数格式：如"一、"、"1."、"（一）"等
-5. 保持原始层级结构，不要改变标题内容
-6. 输出时不要包含任何解释性文字，只输出目录内容本身
-
-示例输出格式：
-# 第一章 绪论 1
-## 1.1 研究背景 1
-## 1.2 研究意义 3
-# 第二章 文献综述 5
-## 2.1 国内研究现状 5
-## 2.2 国外研究现状 8`;
-            
-            navigator.clipboard.writeText(promptText).then(() => {
-                showNotification('提示词已复制到剪贴板', 'success');
-            }).catch(err => {
-                showNotification('复制失败: ' + err, 'error');
-            });
-        }
-        
-        // 页面加载完成后检查是否有已上传的文件
-        window.addEventListener('load', function() {
-            fetch('/check_file')
-            .then(response => response.json())
-            .then(data => {
-                if (data.has_file) {
-                    document.getElementById('deleteFileBtn').classList.remove('hidden');
-                }
-                
-                // 检查是否有草稿
-                fetch('/check_draft')
-                .then(response => response.json())
-                .then(draftData => {
-                    if (draftData.has_draft) {
-                        document.getElementById('draftIndicator').style.display = 'block';
-                    }
-                });
-            });
-        });
-    </script>
-</body>
-</html>
-            '''
-            
-            self.wfile.write(html_content.encode('utf-8'))
-        
-        elif self.path.startswith('/toc_image/'):
-            # 提供目录图片
+        body, content_type = asset
+        self.send_response(200)
+        self.send_header('Content-type', content_type)
+        self.send_header('ETag', _ASSET_ETAG)
+        self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _get_toc_image(self):
+        """提供目录图片"""
+        try:
+            # basename丢弃任何路径成分，请求只能命中临时目录里的文件
+            image_name = os.path.basename(unquote(self.path[len('/toc_image/'):]))
+            image_path = os.path.join(_TMP_DIR, image_name)
+
+            # 直接尝试打开，省去exists+open的两次stat，也没有检查和打开之间的竞态
             try:
-                from urllib.parse import unquote
-                image_name = unquote(self.path[len('/toc_image/'):])
-                temp_dir = tempfile.gettempdir()
-                image_path = os.path.join(temp_dir, image_name)
-                
-                if os.path.exists(image_path):
-                    with open(image_path, 'rb') as f:
-                        self.send_response(200)
-                        self.send_header('Content-type', 'image/png')
-                        self.end_headers()
-                        self.wfile.write(f.read())
-                else:
-                    self.send_error(404)
-            except Exception as e:
-                self.send_error(500, str(e))
-        
-        else:
-            self.send_error(404)
-    
-    def do_POST(self):
-        if self.path == '/upload':
-            # 处理文件上传
-            form = cgi.FieldStorage(
-                fp=self.rfile,
-                headers=self.headers,
-                environ={'REQUEST_METHOD': 'POST'}
-            )
-            
-            file_item = form['pdfFile']
-            if file_item.filename:
-                # 创建临时文件保存上传的PDF
-                temp_dir = tempfile.gettempdir()
-                file_path = os.path.join(temp_dir, file_item.filename)
-                
-                # 如果文件已存在，先删除
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                
-                file_content = file_item.file.read()
-                with open(file_path, 'wb') as f:
-                    f.write(file_content)
-                
-                self.generator.uploaded_file = file_path
-                self.generator.original_filename = file_item.filename
-                # 设置默认输出文件名
-                self.generator.output_filename = file_item.filename.replace('.pdf', '') + '_bookmarked.pdf'
-                
+                f = open(image_path, 'rb')
+            except OSError:
+                self.send_error(404)
+                return
+
+            with f:
+                st = os.fstat(f.fileno())
+                # 弱ETag由修改时间和大小构成；命中时304，不重传图片字节
+                etag = f'W/"{st.st_mtime_ns:x}-{st.st_size:x}"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+
+                # 图片按块拷贝到socket，不整张读进内存
                 self.send_response(200)
-                self.send_header('Content-type', 'application/json')
+                self.send_header('Content-type', 'image/png')
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(st.st_size))
                 self.end_headers()
-                
-                response = {
-                    'status': 'success',
-                    'filename': file_item.filename,
-                    'message': '文件上传成功'
-                }
-                self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
-            else:
-                self.send_response(400)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                
-                response = {
-                    'status': 'error',
-                    'message': '未选择文件'
-                }
-                self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
-        
-        elif self.path == '/parse_toc':
-            # 解析目录文本
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
-            
-            toc_text = data.get('toc_text', '')
-            bookmarks = self.generator.parse_toc_text(toc_text)
-            
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            
-            response = {
+                shutil.copyfileobj(f, self.wfile)
+        except Exception as e:
+            self.send_error(500, str(e))
+
+    # ------------------------------------------------------------------
+    # POST 路由
+    # ------------------------------------------------------------------
+
+    def _post_upload(self):
+        """处理文件上传，内容直接流式写入临时目录"""
+        # 先写.part文件，写完后原子改名顶替同名旧文件：
+        # 重新上传失败时旧文件仍然完好，也省掉一次先删后写
+        def upload_path(name):
+            return os.path.join(_TMP_DIR, name + '.part')
+
+        filename, part_path = self._stream_multipart_file('pdfFile', upload_path)
+        if filename:
+            file_path = part_path[:-len('.part')]
+            os.replace(part_path, file_path)
+            with self.generator_lock:
+                self.generator.uploaded_file = file_path
+                self.generator.original_filename = filename
+                # 设置默认输出文件名
+                self.generator.output_filename = os.path.splitext(filename)[0] + '_bookmarked.pdf'
+            # 文件状态变了，让/check_file的缓存立即失效
+            RequestHandler._check_file_at = 0.0
+
+            self._send_json({
                 'status': 'success',
-                'bookmarks': bookmarks,
-                'original_bookmarks': self.generator.original_bookmarks
-            }
-            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
-
-        elif self.path == '/save_bookmarks':
-            # 保存书签
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
-            
-            bookmarks = data.get('bookmarks', [])
+                'filename': filename,
+                'message': '文件上传成功'
+            })
+        else:
+            self._send_json({
+                'status': 'error',
+                'message': '未选择文件'
+            }, status=400)
+
+    def _post_parse_toc(self):
+        """解析目录文本"""
+        data = self._read_json_body()
+
+        toc_text = data.get('toc_text', '')
+        with self.generator_lock:
+            bookmarks = self.generator.parse_toc_text(toc_text)
+
+        self._send_json({
+            'status': 'success',
+            'bookmarks': bookmarks,
+            'original_bookmarks': self.generator.original_bookmarks
+        })
+
+    def _post_save_bookmarks(self):
+        """保存书签"""
+        data = self._read_json_body()
+
+        bookmarks = data.get('bookmarks', [])
+        with self.generator_lock:
             self.generator.bookmarks = bookmarks
-            
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            
-            response = {
-                'status': 'success',
-                'message': '书签保存成功'
-            }
-            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
-
-        elif self.path == '/apply_offset':
-            # 应用偏移量
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
-            
-            offset = data.get('offset', 0)
+
+        self._send_json({
+            'status': 'success',
+            'message': '书签保存成功'
+        })
+
+    def _post_apply_offset(self):
+        """应用偏移量"""
+        data = self._read_json_body()
+
+        offset = data.get('offset', 0)
+        with self.generator_lock:
             self.generator.offset = offset  # 更新偏移量
-            
+
             # 应用偏移量到书签
             bookmarks = self.generator.apply_offset(self.generator.original_bookmarks, offset)
             self.generator.bookmarks = bookmarks
-            
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            
-            response = {
-                'status': 'success',
-                'bookmarks': self.generator.bookmarks,
-                'original_bookmarks': self.generator.original_bookmarks,
-                'offset': self.generator.offset,
-                'message': '偏移量已应用'
-            }
-            self.wfile.write(json.dumps(response).encode('utf-8'))
-        
-        elif self.path == '/preview_offset':
-            # 预览偏移量变化
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
-            
-            offset = data.get('offset', 0)
-            
-            # 计算变化
-            changes = []
-            for i, bookmark in enumerate(self.generator.original_bookmarks):
-                original_page = bookmark['page']
-                new_page = original_page + offset if original_page is not None else None
-                changes.append({
-                    'title': bookmark['title'],
-                    'original_page': original_page,
-                    'new_page': new_page
-                })
-            
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            
-            response = {
-                'status': 'success',
-                'changes': changes,
-                'message': '预览成功'
+
+        # 前端从/parse_toc起就持有original_bookmarks，这里不再重复传一份
+        self._send_json({
+            'status': 'success',
+            'bookmarks': self.generator.bookmarks,
+            'offset': self.generator.offset,
+            'message': '偏移量已应用'
+        })
+
+    def _post_preview_offset(self):
+        """预览偏移量变化"""
+        data = self._read_json_body()
+
+        offset = data.get('offset', 0)
+
+        # 计算变化；标题在服务端转义好，前端可直接拼进innerHTML
+        changes = [
+            {
+                'title': bookmark['title'],
+                'title_html': escape_html(bookmark['title']),
+                'original_page': bookmark['page'],
+                'new_page': bookmark['page'] + offset if bookmark['page'] is not None else None
             }
-            self.wfile.write(json.dumps(response).encode('utf-8'))
-        
-        elif self.path == '/move_bookmark':
-            # 移动书签
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
-            
-            indices = data.get('indices', [])
-            direction = data.get('direction', 'down')
-            
-            # 为了简化，我们按索引顺序移动书签
-            if direction == 'up':
-                # 从小到大排序，确保前面的先移动
-                indices.sort()
-                for index in indices:
-                    self.generator.move_bookmark(index, 'up')
-            else:
-                # 从大到小排序，确保后面的先移动
-                indices.sort(reverse=True)
-                for index in indices:
-                    self.generator.move_bookmark(index, 'down')
-            
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            
-            response = {
+            for bookmark in self.generator.original_bookmarks
+        ]
+
+        self._send_json({
+            'status': 'success',
+            'changes': changes,
+            'message': '预览成功'
+        })
+
+    def _post_move_bookmark(self):
+        """移动书签"""
+        data = self._read_json_body()
+
+        indices = data.get('indices', [])
+        direction = data.get('direction', 'down')
+
+        # 整批移动一次完成，状态和草稿也只保存一次
+        with self.generator_lock:
+            ops = self.generator.move_bookmarks_batch(indices, direction)
+
+        # 只回执实际发生的交换，前端在本地模型上重演；
+        # 响应大小从O(全部书签)降到O(选中数)
+        self._send_json({
+            'status': 'success',
+            'ops': ops,
+            'message': '书签已移动'
+        })
+
+    def _post_undo(self):
+        """撤销操作"""
+        # success = self.generator.undo()
+
+        self._send_json({
+            'status': 'error',
+            'message': '撤销功能已移除'
+        })
+
+    def _post_extract_toc(self):
+        """提取目录页"""
+        image_path = self.generator.extract_toc_pages()
+
+        if image_path and os.path.exists(image_path):
+            image_name = os.path.basename(image_path)
+            self._send_json({
                 'status': 'success',
-                'bookmarks': self.generator.bookmarks,
-                'original_bookmarks': self.generator.original_bookmarks,
-                'message': '书签已移动'
-            }
-            self.wfile.write(json.dumps(response).encode('utf-8'))
-        
-        elif self.path == '/undo':
-            # 撤销操作
-            # success = self.generator.undo()
-            
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            
-            response = {
+                'image_url': f'/toc_image/{image_name}',
+                'message': '目录页提取成功'
+            })
+        else:
+            self._send_json({
                 'status': 'error',
-                'message': '撤销功能已移除'
-            }
-            self.wfile.write(json.dumps(response).encode('utf-8'))
-        
-        elif self.path == '/extract_toc':
-            # 提取目录页
-            image_path = self.generator.extract_toc_pages()
-            
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            
-            if image_path and os.path.exists(image_path):
-                image_name = os.path.basename(image_path)
-                response = {
-                    'status': 'success',
-                    'image_url': f'/toc_image/{image_name}',
-                    'message': '目录页提取成功'
-                }
-            else:
-                response = {
-                    'status': 'error',
-                    'message': '目录页提取失败'
-                }
-            self.wfile.write(json.dumps(response).encode('utf-8'))
-        
-        elif self.path == '/update_toc_pages':
-            # 更新目录页范围
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
-            
-            toc_start_page = data.get('toc_start_page', 1)
-            toc_end_page = data.get('toc_end_page', 1)
-            
+                'message': '目录页提取失败'
+            })
+
+    def _post_update_toc_pages(self):
+        """更新目录页范围"""
+        data = self._read_json_body()
+
+        toc_start_page = data.get('toc_start_page', 1)
+        toc_end_page = data.get('toc_end_page', 1)
+
+        with self.generator_lock:
             self.generator.toc_start_page = toc_start_page
             self.generator.toc_end_page = toc_end_page
-            
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            
-            response = {
-                'status': 'success',
-                'message': '目录页范围已更新'
-            }
-            self.wfile.write(json.dumps(response).encode('utf-8'))
-        
-        elif self.path == '/generate_pdf':
-            # 生成PDF
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
-            
-            output_filename = data.get('output_filename', '')
+
+        self._send_json({
+            'status': 'success',
+            'message': '目录页范围已更新'
+        })
+
+    def _post_generate_pdf(self):
+        """生成PDF：放到后台线程执行，立即返回任务ID
+
+        大文件生成可能要几十秒，阻塞在这里会让浏览器请求超时；
+        前端拿到job_id后轮询/job_status查进度
+        """
+        data = self._read_json_body()
+
+        output_filename = data.get('output_filename', '')
+        with self.generator_lock:
             if output_filename:
                 self.generator.output_filename = output_filename
             elif not self.generator.output_filename:
                 # 如果没有设置输出文件名，使用默认名称
-                self.generator.output_filename = self.generator.original_filename.replace('.pdf', '') + '_bookmarked.pdf'
-            
-            success = self.generator.generate_pdf_with_bookmarks()
-            
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            
-            if success:
-                response = {
-                    'status': 'success',
-                    'message': f'PDF文件已生成: {self.generator.output_filename}'
-                }
-            else:
-                response = {
-                    'status': 'error',
-                    'message': 'PDF生成失败，请检查日志'
-                }
-            self.wfile.write(json.dumps(response).encode('utf-8'))
-        
-        elif self.path == '/delete_file':
-            # 删除已上传文件
-            if self.generator.uploaded_file and os.path.exists(self.generator.uploaded_file):
-                try:
+                self.generator.output_filename = os.path.splitext(self.generator.original_filename)[0] + '_bookmarked.pdf'
+
+        job_id = uuid.uuid4().hex
+        with self._jobs_lock:
+            self._jobs[job_id] = {'status': 'running', 'message': 'PDF生成中'}
+
+        # generator持有打开的PDF对象，不能pickle到子进程；
+        # 生成是PyPDF2里的I/O密集工作，后台线程即可让请求立即返回
+        worker = threading.Thread(target=self._run_generate_job, args=(job_id,))
+        worker.daemon = True
+        worker.start()
+
+        self._send_json({
+            'status': 'success',
+            'job_id': job_id,
+            'message': 'PDF生成已开始'
+        })
+
+    @classmethod
+    def _run_generate_job(cls, job_id):
+        """后台执行PDF生成并更新任务状态"""
+        try:
+            # 生成全程持锁：编辑、偏移、删除文件等修改generator状态的
+            # 请求会排队等待，避免生成中途书签列表被改写出撕裂的目录
+            with cls.generator_lock:
+                success = cls.generator.generate_pdf_with_bookmarks()
+                message = (f'PDF文件已生成: {cls.generator.output_filename}'
+                           if success else 'PDF生成失败，请检查日志')
+            result = {'status': 'done' if success else 'error', 'message': message}
+        except Exception as e:
+            result = {'status': 'error', 'message': f'PDF生成出错: {str(e)}'}
+        with cls._jobs_lock:
+            cls._jobs[job_id] = result
+
+    def _get_job_status(self):
+        """查询后台任务状态"""
+        query = self.path.partition('?')[2]
+        job_id = parse_qs(query).get('id', [''])[0]
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            self._send_json({'status': 'error', 'message': '任务不存在'}, status=404)
+        else:
+            self._send_json(job)
+
+    def _post_delete_file(self):
+        """删除已上传文件"""
+        if self.generator.uploaded_file and os.path.exists(self.generator.uploaded_file):
+            try:
+                with self.generator_lock:
                     os.remove(self.generator.uploaded_file)
                     self.generator.uploaded_file = None
                     self.generator.original_filename = ""
                     self.generator.output_filename = ""
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/json')
-                    self.end_headers()
-                    
-                    response = {
-                        'status': 'success',
-                        'message': '文件已删除'
-                    }
-                    self.wfile.write(json.dumps(response).encode('utf-8'))
-                except Exception as e:
-                    self.send_response(500)
-                    self.send_header('Content-type', 'application/json')
-                    self.end_headers()
-                    
-                    response = {
-                        'status': 'error',
-                        'message': f'删除文件时出错: {str(e)}'
-                    }
-                    self.wfile.write(json.dumps(response).encode('utf-8'))
-            else:
-                self.send_response(400)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                
-                response = {
+                RequestHandler._check_file_at = 0.0
+                self._send_json({
+                    'status': 'success',
+                    'message': '文件已删除'
+                })
+            except Exception as e:
+                self._send_json({
                     'status': 'error',
-                    'message': '没有可删除的文件'
-                }
-                self.wfile.write(json.dumps(response).encode('utf-8'))
-        
-        elif self.path == '/check_file':
-            # 检查是否有已上传文件
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            
-            response = {
-                'has_file': self.generator.uploaded_file is not None and os.path.exists(self.generator.uploaded_file)
-            }
-            self.wfile.write(json.dumps(response).encode('utf-8'))
-        
-        elif self.path == '/check_draft':
-            # 检查是否有草稿
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            
-            response = {
-                'has_draft': os.path.exists(self.generator.draft_file)
-            }
-            self.wfile.write(json.dumps(response).encode('utf-8'))
-        
-        elif self.path == '/exit':
-            # 退出程序
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            
-            response = {
-                'status': 'success',
-                'message': '程序正在退出'
-            }
-            self.wfile.write(json.dumps(response).encode('utf-8'))
-            
-            # 在单独的线程中关闭服务器，确保响应能被发送出去
-            import threading
-            threading.Thread(target=self.server.shutdown).start()
-        
+                    'message': f'删除文件时出错: {str(e)}'
+                }, status=500)
         else:
-            self.send_error(404)
\ No newline at end of file
+            self._send_json({
+                'status': 'error',
+                'message': '没有可删除的文件'
+            }, status=400)
+
+    def _post_check_file(self):
+        """检查是否有已上传文件"""
+        cls = RequestHandler
+        now = time.monotonic()
+        if now - cls._check_file_at >= cls._CHECK_FILE_TTL:
+            cls._check_file_result = (self.generator.uploaded_file is not None
+                                      and os.path.exists(self.generator.uploaded_file))
+            cls._check_file_at = now
+        self._send_json({
+            'has_file': cls._check_file_result
+        })
+
+    def _post_init_state(self):
+        """页面初始化状态：一次往返同时返回文件与草稿的存在性"""
+        self._send_json({
+            'has_file': (self.generator.uploaded_file is not None
+                         and os.path.exists(self.generator.uploaded_file)),
+            'has_draft': os.path.exists(self.generator.draft_file)
+        })
+
+    def _post_check_draft(self):
+        """检查是否有草稿"""
+        self._send_json({
+            'has_draft': os.path.exists(self.generator.draft_file)
+        })
+
+    def _post_exit(self):
+        """退出程序"""
+        self._send_json({
+            'status': 'success',
+            'message': '程序正在退出'
+        })
+
+        # 在单独的线程中关闭服务器，确保响应能被发送出去
+        threading.Thread(target=self.server.shutdown).start()
+
+    # 路由表：字典一次哈希查找取代逐个字符串比较的if/elif长链
+    _GET_ROUTES = {
+        '/': _get_index,
+    }
+    _GET_PREFIX_ROUTES = (
+        ('/static/', _get_static),
+        ('/toc_image/', _get_toc_image),
+        ('/job_status', _get_job_status),
+    )
+    _POST_ROUTES = {
+        '/upload': _post_upload,
+        '/parse_toc': _post_parse_toc,
+        '/save_bookmarks': _post_save_bookmarks,
+        '/apply_offset': _post_apply_offset,
+        '/preview_offset': _post_preview_offset,
+        '/move_bookmark': _post_move_bookmark,
+        '/undo': _post_undo,
+        '/extract_toc': _post_extract_toc,
+        '/update_toc_pages': _post_update_toc_pages,
+        '/generate_pdf': _post_generate_pdf,
+        '/delete_file': _post_delete_file,
+        '/check_file': _post_check_file,
+        '/check_draft': _post_check_draft,
+        '/init_state': _post_init_state,
+        '/exit': _post_exit,
+    }
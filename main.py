@@ -3,19 +3,30 @@ Main application file for PDF Content Bookmark Generator
 """
 
 import webbrowser
-from http.server import HTTPServer
+from http.server import ThreadingHTTPServer
 import threading
 import time
 
 from handlers.request_handler import RequestHandler
 
 
+class AppServer(ThreadingHTTPServer):
+    """
+    每个连接一个工作线程的HTTP服务器
+    上传或生成PDF等耗时请求不再阻塞页面的其他请求
+    """
+    # 随主线程一起退出，不因存活的连接线程挂住进程
+    daemon_threads = True
+    # 等待队列上限，防止积压过多未接受的连接
+    request_queue_size = 16
+
+
 def run_server(port=8083):
     """
     Run the HTTP server for the PDF Bookmark Generator
     """
     server_address = ('', port)
-    httpd = HTTPServer(server_address, RequestHandler)
+    httpd = AppServer(server_address, RequestHandler)
     print(f"服务器启动，访问地址: http://localhost:{port}")
 
     # 在单独的线程中尝试打开浏览器
@@ -3,15 +3,9 @@ UI Components for PDF Bookmark Generator
 Contains HTML, CSS, and JavaScript for the web interface
 """
 
-def get_html_content():
-    return '''
-<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>PDF书签生成器</title>
-    <style>
+# 页面骨架与CSS/JS分离：样式和脚本作为独立静态资源提供，
+# 浏览器可长期缓存，重复访问时只需重新拿很小的HTML外壳
+_CSS = '''
         body { font-family: Arial, sans-serif; margin: 20px; }
         .container { max-width: 1000px; margin: 0 auto; }
         h1 { color: #333; }
@@ -59,7 +53,12 @@ def get_html_content():
         }
         .bookmark-row {
             cursor: move;
+            /* 固定行高是虚拟滚动的前提：窗口位置按行高直接换算 */
+            height: 48px;
         }
+        #bookmarksTable td { padding: 4px 8px; }
+        #bookmarksTable input, #bookmarksTable select { margin-bottom: 0; }
+        .spacer-row td { padding: 0; border: none; }
         .bookmark-row.dragging {
             opacity: 0.5;
             background-color: #f0f0f0;
@@ -86,6 +85,8 @@ def get_html_content():
             overflow-y: auto;
             border: 1px solid #ddd;
             padding: 10px;
+            /* 布局/绘制隔离：表格内的改动不触发容器外的重排重绘 */
+            contain: layout paint style;
         }
         .page-info {
             font-size: 0.9em;
@@ -126,169 +127,257 @@ def get_html_content():
             margin-bottom: 15px;
             display: none;
         }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>PDF书签生成器 Beta</h1>
-        <div class="draft-indicator" id="draftIndicator">
-            检测到草稿文件，已自动加载上次的工作进度
-        </div>
-        <div class="page-info">
-            <p><strong>页码说明：</strong>用户输入的页码为PDF显示页码（1基索引），系统会自动转换为PDF内部索引（0基索引）</p>
-        </div>
-        
-        <!-- 文件上传部分 -->
-        <div class="section">
-            <h2>1. 上传PDF文件</h2>
-            <form id="uploadForm" enctype="multipart/form-data">
-                <label for="pdfFile">选择PDF文件:</label>
-                <input type="file" id="pdfFile" name="pdfFile" accept=".pdf" required>
-                <button type="submit">上传PDF</button>
-                <button type="button" id="deleteFileBtn" class="btn-danger hidden" onclick="deleteUploadedFile()">删除已上传文件</button>
-            </form>
-            <div id="uploadStatus"></div>
-        </div>
-        
-        <!-- 目录页提取部分 -->
-        <div class="section">
-            <h2>2. 提取目录页（可选）</h2>
-            <label for="tocStartPage">目录起始页:</label>
-            <input type="number" id="tocStartPage" min="1" value="1">
-            
-            <label for="tocEndPage">目录结束页:</label>
-            <input type="number" id="tocEndPage" min="1" value="1">
-            
-            <button onclick="updateTocPages()" class="btn-warning">更新目录页范围</button>
-            <button onclick="extractTocPages()">提取目录页</button>
-            <button onclick="openQwen()" class="btn-info">使用通义千问识别目录</button>
-            <div>
-                <div style="display: flex; align-items: center;">
-                    <div style="flex-grow: 1;">
-                        <div style="font-weight: bold;">推荐提示词：</div>
-                        <div id="promptContainer" style="max-height: 100px; overflow-y: auto; border: 1px solid #ccc; padding: 10px; background-color: #f9f9f9;">
-请分析这个PDF文档的目录页，并按照以下要求输出目录结构：<br><br>
-
-1. 保留完整的层级结构信息，使用缩进或编号方式表示层级关系<br>
-2. 每行输出一个目录项，格式为："标题内容 ...................... 页码"（页码前的点线为可选）<br>
-3. 对于缺失页码的条目，请根据上下文逻辑推断并补充完整页码<br>
-4. 支持多种标题格式：<br>
-&nbsp;&nbsp;&nbsp;- 章节编号格式：如"第1章 绪论"、"1.1 背景介绍"<br>
-&nbsp;&nbsp;&nbsp;- Markdown格式：使用#符号表示层级<br>
-&nbsp;&nbsp;&nbsp;- 缩进格式：通过空格或制表符表示层级<br>
-&nbsp;&nbsp;&nbsp;- 中文序数格式：如"一、"、"1."、"（一）"等<br>
-5. 保持原始层级结构，不要改变标题内容<br>
-6. 输出时不要包含任何解释性文字，只输出目录内容本身<br><br>
-
-示例输出格式：<br>
-# 第一章 绪论 1<br>
-## 1.1 研究背景 1<br>
-## 1.2 研究意义 3<br>
-# 第二章 文献综述 5<br>
-## 2.1 国内研究现状 5<br>
-## 2.2 国外研究现状 8<br>
-                        </div>
-                    </div>
-                    <div style="margin-left: 10px;">
-                        <button onclick="copyPrompt()" class="btn-secondary">复制提示词</button>
-                    </div>
-                </div>
-            </div>
-            <div id="tocImageContainer"></div>
-        </div>
-        
-        <!-- 目录输入部分 -->
-        <div class="section">
-            <h2>3. 输入目录文本</h2>
-            <label for="tocText">粘贴目录内容:</label>
-            <textarea id="tocText" rows="10" placeholder="在此粘贴目录内容&#10;支持格式示例:&#10;章节1 标题 ...................... 1&#10;2 第二章 标题&#10;# 第一章 标题 5&#10;* 第一节 标题 10&#10;## 1.1 第一节标题 10"></textarea>
-            <button onclick="parseTocText()">解析目录</button>
-            <button onclick="previewParseResult()" class="btn-info">预览解析结果</button>
-            <div id="parseStatus"></div>
-            <div id="parsePreview" class="preview-section" style="display: none;"></div>
-        </div>
-        
-        <!-- 参数设置部分 -->
-        <div class="section">
-            <h2>4. 设置参数</h2>
-            <div class="offset-display">
-                <strong>当前使用的偏移量:</strong> <span id="currentOffset">0</span>
-            </div>
-            
-            <label for="contentStartPage">正文起始页:</label>
-            <input type="number" id="contentStartPage" min="1" value="1">
-            
-            <button onclick="calculateAndApplyOffset()">计算并应用偏移量</button>
-            
-            <label for="manualOffset">手动设置偏移量:</label>
-            <input type="number" id="manualOffset" value="0">
-            <button onclick="applyManualOffset()">应用手动偏移量</button>
-            
-            <div class="preview-section">
-                <h3>偏移量预览</h3>
-                <p>应用偏移量后，将更新书签编辑器中的PDF页码列（实际页码 = 原始页码 + 偏移量）</p>
-                <button onclick="previewOffsetChanges()">预览偏移量变化</button>
-                <div id="offsetPreview"></div>
-            </div>
-            
-            <label for="outputFileName">输出文件名:</label>
-            <input type="text" id="outputFileName" value="">
-        </div>
-        
-        <!-- 书签编辑部分 -->
-        <div class="section">
-            <h2>5. 编辑书签</h2>
-            <div class="actions">
-                <button onclick="addBookmarkBeforeSelected()">在选中行前添加书签</button>
-                <button onclick="addBookmark()">添加书签到末尾</button>
-                <button onclick="saveBookmarks()">保存修改</button>
-                <button class="btn-danger" onclick="deleteSelectedBookmarks()">删除选中书签</button>
-                <button class="btn-warning" onclick="moveSelectedUp()">上移</button>
-                <button class="btn-warning" onclick="moveSelectedDown()">下移</button>
-                <button onclick="invertSelection()">反选</button>
-            </div>
-            <div class="bookmarks-container">
-                <table id="bookmarksTable">
-                    <thead>
-                        <tr>
-                            <th><input type="checkbox" id="selectAll" onchange="toggleSelectAll()"></th>
-                            <th>层级</th>
-                            <th>标题</th>
-                            <th>原始页码</th>
-                            <th>PDF页码</th>
-                            <th>操作</th>
-                        </tr>
-                    </thead>
-                    <tbody id="bookmarksTableBody">
-                        <!-- 书签将在这里动态生成 -->
-                    </tbody>
-                </table>
-            </div>
-        </div>
-        
-        <!-- 生成PDF部分 -->
-        <div class="section">
-            <h2>6. 生成PDF</h2>
-            <button class="btn-secondary" onclick="generatePdf()">生成PDF</button>
-            <button class="btn-danger" onclick="exitApplication()">退出程序</button>
-            <div id="generationStatus"></div>
-        </div>
-    </div>
+    
+'''
 
-    <script>
+_JS = '''
         let draggedRow = null;
-        
-        // 解析目录文本
-        function parseTocText() {
-            const tocText = document.getElementById('tocText').value;
-            fetch('/parse_toc', {
+
+        // 预编译一次：只剥掉结尾的.pdf扩展名，大小写不敏感
+        const PDF_EXT_RE = /\\.pdf$/i;
+
+        // 书签数据以JS数组为准，表格只是它的一个可视窗口
+        let bookmarksData = [];
+        let originalBookmarksData = [];
+        // 选中状态按索引记在集合里，行滚出窗口后仍然保留
+        let selectedIndices = new Set();
+
+        // 连续两次应用相同偏移量时跳过重复渲染；
+        // 任何本地模型修改或其他来源的渲染都必须把键清空，
+        // 否则服务器重算的页码会被跳过不显示
+        let lastOffsetRenderKey = null;
+
+        // 虚拟滚动：只渲染视口内外一小段行，几千行的目录DOM里也只有几十行
+        const ROW_HEIGHT = 48;      // 与CSS中.bookmark-row的固定行高一致
+        const WINDOW_BUFFER = 10;   // 视口上下各多渲染的行数
+        let windowStart = 0;
+
+        const bookmarksTbody = document.querySelector('#bookmarksTable tbody');
+        const bookmarksScroller = document.querySelector('.bookmarks-container');
+
+        // 常用元素在脚本加载时查一次，之后全部走缓存引用，
+        // 不再于每个事件处理器里重复执行document查询
+        const DOM = {
+            selectAll: document.getElementById('selectAll'),
+            currentOffset: document.getElementById('currentOffset'),
+            uploadStatus: document.getElementById('uploadStatus'),
+            generationStatus: document.getElementById('generationStatus'),
+            deleteFileBtn: document.getElementById('deleteFileBtn'),
+            tocText: document.getElementById('tocText'),
+            parseStatus: document.getElementById('parseStatus'),
+            parsePreview: document.getElementById('parsePreview'),
+            offsetPreview: document.getElementById('offsetPreview'),
+            contentStartPage: document.getElementById('contentStartPage'),
+            manualOffset: document.getElementById('manualOffset'),
+            outputFileName: document.getElementById('outputFileName'),
+            tocStartPage: document.getElementById('tocStartPage'),
+            tocEndPage: document.getElementById('tocEndPage'),
+            tocImageContainer: document.getElementById('tocImageContainer'),
+            draftIndicator: document.getElementById('draftIndicator'),
+            pdfFile: document.getElementById('pdfFile')
+        };
+
+        // 拖拽事件委托到tbody上只注册一次：
+        // 不再为每一行挂四个监听器，行数再多注册成本也是O(1)
+        bookmarksTbody.addEventListener('dragstart', handleDragStart);
+        bookmarksTbody.addEventListener('dragover', handleDragOver);
+        bookmarksTbody.addEventListener('drop', handleDrop);
+        bookmarksTbody.addEventListener('dragend', handleDragEnd);
+
+        // 编辑后的自动保存：300ms静默期内的连续敲击合并成一次请求，
+        // sendBeacon在后台投递，不阻塞主线程也不需要处理响应
+        let autoSaveTimer = null;
+        function scheduleAutoSave() {
+            clearTimeout(autoSaveTimer);
+            autoSaveTimer = setTimeout(flushAutoSave, 300);
+        }
+        function flushAutoSave() {
+            autoSaveTimer = null;
+            const blob = new Blob([JSON.stringify({bookmarks: bookmarksData})],
+                                  {type: 'application/json'});
+            navigator.sendBeacon('/save_bookmarks', blob);
+        }
+        // 页面关闭/切后台时把还没到期的保存立刻发出去
+        document.addEventListener('visibilitychange', function() {
+            if (document.visibilityState === 'hidden' && autoSaveTimer !== null) {
+                clearTimeout(autoSaveTimer);
+                flushAutoSave();
+            }
+        });
+
+        // 编辑即回写数据模型：行滚出窗口被回收后修改也不会丢
+        bookmarksTbody.addEventListener('input', function(e) {
+            const row = e.target.closest('.bookmark-row');
+            if (!row) return;
+            const bookmark = bookmarksData[parseInt(row.dataset.index)];
+            if (!bookmark) return;
+            if (e.target.classList.contains('title-input')) {
+                bookmark.title = e.target.value;
+            } else if (e.target.classList.contains('page-input')) {
+                bookmark.page = e.target.value ? parseInt(e.target.value) : null;
+            } else {
+                return;
+            }
+            lastOffsetRenderKey = null;
+            scheduleAutoSave();
+        });
+        bookmarksTbody.addEventListener('change', function(e) {
+            const row = e.target.closest('.bookmark-row');
+            if (!row) return;
+            const index = parseInt(row.dataset.index);
+            if (e.target.classList.contains('bookmark-select')) {
+                if (e.target.checked) {
+                    selectedIndices.add(index);
+                } else {
+                    selectedIndices.delete(index);
+                }
+            } else if (e.target.classList.contains('level-select')) {
+                if (bookmarksData[index]) {
+                    bookmarksData[index].level = parseInt(e.target.value);
+                }
+                lastOffsetRenderKey = null;
+                scheduleAutoSave();
+                onLevelChange(e.target);
+            }
+        });
+
+        // 行内按钮同样走委托，模板里不再写内联onclick/onchange，
+        // 避免浏览器为每一行各编译一份处理函数
+        bookmarksTbody.addEventListener('click', function(e) {
+            if (e.target.matches('.btn-danger')) {
+                removeBookmark(e.target);
+            }
+        });
+
+        // 非阻塞确认框：原生confirm()会同步冻结主线程，
+        // 连带挂起所有待执行的rAF回调和绘制；这里用Promise化的自定义弹层
+        const confirmOverlay = document.createElement('div');
+        confirmOverlay.style.cssText =
+            'display:none;position:fixed;inset:0;background:rgba(0,0,0,0.4);z-index:2000;';
+        confirmOverlay.innerHTML = `
+            <div style="background:#fff;max-width:400px;margin:20vh auto;padding:20px;border-radius:5px;">
+                <p class="confirm-message"></p>
+                <div style="text-align:right;">
+                    <button class="confirm-ok">确定</button>
+                    <button class="confirm-cancel btn-secondary" style="margin-right:0;">取消</button>
+                </div>
+            </div>`;
+        document.body.appendChild(confirmOverlay);
+        let confirmResolve = null;
+
+        function closeConfirm(result) {
+            confirmOverlay.style.display = 'none';
+            if (confirmResolve) {
+                const resolve = confirmResolve;
+                confirmResolve = null;
+                resolve(result);
+            }
+        }
+        confirmOverlay.querySelector('.confirm-ok').addEventListener('click', () => closeConfirm(true));
+        confirmOverlay.querySelector('.confirm-cancel').addEventListener('click', () => closeConfirm(false));
+
+        function confirmAsync(message) {
+            confirmOverlay.querySelector('.confirm-message').textContent = message;
+            confirmOverlay.style.display = 'block';
+            return new Promise(resolve => { confirmResolve = resolve; });
+        }
+
+        // 同类变更请求只保留最后一个：重复点击时中止上一个在途请求，
+        // 避免旧响应在新请求之后到达并用过期数据重绘表格
+        const inflight = { move: null, offset: null, save: null, preview: null };
+
+        // JSON POST的统一封装：共享头部与解析，并对完全相同的
+        // 在途请求去重——重复点击只会复用同一个未完成的Promise
+        const inflightPosts = new Map();
+        function postJSON(url, body) {
+            const key = url + ':' + (body === undefined ? '' : JSON.stringify(body));
+            if (inflightPosts.has(key)) return inflightPosts.get(key);
+            const p = fetch(url, {
                 method: 'POST',
                 headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({toc_text: tocText})
+                body: body === undefined ? undefined : JSON.stringify(body)
             })
             .then(response => response.json())
+            .finally(() => inflightPosts.delete(key));
+            inflightPosts.set(key, p);
+            return p;
+        }
+
+        function abortableFetch(kind, url, options) {
+            if (inflight[kind]) {
+                inflight[kind].abort();
+            }
+            const controller = new AbortController();
+            inflight[kind] = controller;
+            options = options || {};
+            options.signal = controller.signal;
+            return fetch(url, options).finally(() => {
+                if (inflight[kind] === controller) {
+                    inflight[kind] = null;
+                }
+            });
+        }
+
+        // 滚动时按帧刷新窗口
+        let scrollFrame = 0;
+        bookmarksScroller.addEventListener('scroll', function() {
+            if (scrollFrame) return;
+            scrollFrame = requestAnimationFrame(function() {
+                scrollFrame = 0;
+                renderWindow();
+            });
+        });
+
+        const bookmarkRowTpl = document.getElementById('bookmarkRowTpl');
+
+        // 构建单行：克隆预解析的模板，再命令式填入动态字段；
+        // 赋值走.value/.textContent，标题也无需再做HTML转义
+        function buildRow(bookmark, index) {
+            const originalPage = originalBookmarksData[index] ? originalBookmarksData[index].page : null;
+            const row = bookmarkRowTpl.content.firstElementChild.cloneNode(true);
+            row.dataset.index = index;
+            row.querySelector('.bookmark-select').checked = selectedIndices.has(index);
+            row.querySelector('.title-input').value = bookmark.title;
+            row.children[3].textContent = originalPage || '';
+            row.querySelector('.page-input').value = bookmark.page || '';
+            row.querySelector('.level-select').value = bookmark.level;
+            return row;
+        }
+
+        // 构建撑高用的占位行
+        function buildSpacer(height) {
+            const row = document.createElement('tr');
+            row.className = 'spacer-row';
+            row.innerHTML = `<td colspan="6" style="height: ${height}px;"></td>`;
+            return row;
+        }
+
+        // 渲染当前可见窗口内的行，窗口外用占位行撑出总高度
+        function renderWindow() {
+            const total = bookmarksData.length;
+            const viewHeight = bookmarksScroller.clientHeight || 500;
+            let start = Math.floor(bookmarksScroller.scrollTop / ROW_HEIGHT) - WINDOW_BUFFER;
+            if (start < 0) start = 0;
+            const end = Math.min(total, start + Math.ceil(viewHeight / ROW_HEIGHT) + WINDOW_BUFFER * 2);
+            windowStart = start;
+
+            const frag = document.createDocumentFragment();
+            frag.appendChild(buildSpacer(start * ROW_HEIGHT));
+            for (let i = start; i < end; i++) {
+                frag.appendChild(buildRow(bookmarksData[i], i));
+            }
+            frag.appendChild(buildSpacer((total - end) * ROW_HEIGHT));
+
+            // 一次调用完成清空加挂载，旧行原子地整体脱离文档
+            bookmarksTbody.replaceChildren(frag);
+        }
+
+        // 解析目录文本
+        function parseTocText() {
+            const tocText = DOM.tocText.value;
+            return postJSON('/parse_toc', {toc_text: tocText})
             .then(data => {
-                const statusDiv = document.getElementById('parseStatus');
+                const statusDiv = DOM.parseStatus;
                 if (data.status === 'success') {
                     renderBookmarks(data.bookmarks, data.original_bookmarks);
                     showNotification('目录解析成功，共识别到 ' + data.bookmarks.length + ' 个条目', 'success');
@@ -313,13 +402,13 @@ def get_html_content():
             }
             
             const data = window.lastParseResult;
-            const previewDiv = document.getElementById('parsePreview');
-            
-            let html = `
+            const previewDiv = DOM.parsePreview;
+
+            previewDiv.innerHTML = `
                 <h3>目录解析结果报告</h3>
                 <p><strong>解析状态:</strong> 成功</p>
                 <p><strong>识别条目数:</strong> ${data.bookmarks.length} 个</p>
-                
+
                 <h4>详细信息:</h4>
                 <table style="width: 100%; border-collapse: collapse;">
                     <thead>
@@ -330,146 +419,133 @@ def get_html_content():
                             <th style="border: 1px solid #ddd; padding: 8px; text-align: left;">PDF页码</th>
                         </tr>
                     </thead>
-                    <tbody>`;
-            
-            data.bookmarks.forEach((bookmark, index) => {
-                const originalPage = data.original_bookmarks[index] ? data.original_bookmarks[index].page : null;
-                html += `
+                    <tbody></tbody>
+                </table>
+                <button onclick="this.parentElement.style.display='none'" class="btn-danger" style="margin-top: 10px;">关闭预览</button>
+            `;
+            previewDiv.style.display = 'block';
+
+            // 行分批渲染：每帧最多追加一批后让出主线程，
+            // 几千行的目录也不会出现一次卡死页面的长任务
+            const previewTbody = previewDiv.querySelector('tbody');
+            const CHUNK = 200;
+            let i = 0;
+            function step() {
+                const end = Math.min(i + CHUNK, data.bookmarks.length);
+                let rows = '';
+                for (; i < end; i++) {
+                    const bookmark = data.bookmarks[i];
+                    const originalPage = data.original_bookmarks[i] ? data.original_bookmarks[i].page : null;
+                    rows += `
                     <tr>
                         <td style="border: 1px solid #ddd; padding: 8px;">${bookmark.level}</td>
                         <td style="border: 1px solid #ddd; padding: 8px;">${escapeHtml(bookmark.title)}</td>
                         <td style="border: 1px solid #ddd; padding: 8px;">${originalPage || '无'}</td>
                         <td style="border: 1px solid #ddd; padding: 8px;">${bookmark.page || '无'}</td>
                     </tr>`;
-            });
-            
-            html += `
-                    </tbody>
-                </table>
-                <button onclick="this.parentElement.style.display='none'" class="btn-danger" style="margin-top: 10px;">关闭预览</button>
-            `;
-            
-            previewDiv.innerHTML = html;
-            previewDiv.style.display = 'block';
+                }
+                previewTbody.insertAdjacentHTML('beforeend', rows);
+                if (i < data.bookmarks.length) {
+                    requestAnimationFrame(step);
+                }
+            }
+            requestAnimationFrame(step);
         }
         
-        // 渲染书签表格
+        // 渲染书签表格：数据存入模型，DOM只渲染可见窗口
         function renderBookmarks(bookmarks, originalBookmarks = null) {
-            const tbody = document.querySelector('#bookmarksTable tbody');
-            tbody.innerHTML = '';
-            
-            // 如果没有提供原始书签，则使用当前书签作为原始书签
-            if (!originalBookmarks) {
-                originalBookmarks = bookmarks;
-            }
-            
-            bookmarks.forEach((bookmark, index) => {
-                const originalPage = originalBookmarks[index] ? originalBookmarks[index].page : null;
-                const row = document.createElement('tr');
-                row.className = 'bookmark-row';
-                row.draggable = true;
-                row.innerHTML = `
-                    <td><input type="checkbox" class="bookmark-select" data-index="${index}"></td>
-                    <td>
-                        <select class="level-select" id="level_${index}" onchange="onLevelChange(this)">
-                            <option value="0">级别0</option>
-                            <option value="1">级别1</option>
-                            <option value="2">级别2</option>
-                            <option value="3">级别3</option>
-                        </select>
-                    </td>
-                    <td><input type="text" class="title-input" id="title_${index}" value="${escapeHtml(bookmark.title)}"></td>
-                    <td>${originalPage || ''}</td>
-                    <td><input type="number" class="page-input" id="page_${index}" value="${bookmark.page || ''}"></td>
-                    <td>
-                        <button class="btn-danger" onclick="removeBookmark(this)">删除</button>
-                    </td>
-                `;
-                
-                // 添加拖拽事件
-                row.addEventListener('dragstart', handleDragStart);
-                row.addEventListener('dragover', handleDragOver);
-                row.addEventListener('drop', handleDrop);
-                row.addEventListener('dragend', handleDragEnd);
-                
-                tbody.appendChild(row);
-            });
-            
-            // 在所有行添加完毕后再设置层级选择
-            setTimeout(() => {
-                bookmarks.forEach((bookmark, index) => {
-                    // 设置层级选择
-                    const levelSelect = document.getElementById(`level_${index}`);
-                    if (levelSelect) {
-                        levelSelect.value = bookmark.level;
-                    }
-                });
-            }, 0);
-            
-            // 更新索引
-            updateBookmarkIndices();
+            lastOffsetRenderKey = null;
+            bookmarksData = bookmarks;
+            // 如果没有提供原始书签，则复制当前书签作为原始书签
+            originalBookmarksData = originalBookmarks || bookmarks.map(b => ({...b}));
+            selectedIndices.clear();
+            DOM.selectAll.checked = false;
+            renderWindow();
         }
         
-        // 转义HTML特殊字符
+        // 转义HTML特殊字符：标题通常不含特殊字符，先用test快速判断，
+        // 无需转义时原样返回；需要转义时按字符码查表手动扫描，
+        // 不走replace的逐匹配回调
+        const ESC_TEST = /[&<>"']/;
+        const ESC_TBL = [];
+        ESC_TBL[38] = '&amp;';   // &
+        ESC_TBL[60] = '&lt;';    // <
+        ESC_TBL[62] = '&gt;';    // >
+        ESC_TBL[34] = '&quot;';  // "
+        ESC_TBL[39] = '&#039;';  // '
+
         function escapeHtml(text) {
-            const map = {
-                '&': '&amp;',
-                '<': '&lt;',
-                '>': '&gt;',
-                '"': '&quot;',
-                "'": '&#039;'
-            };
-            return text.replace(/[&<>"']/g, function(m) { return map[m]; });
+            if (!ESC_TEST.test(text)) return text;
+            let out = '';
+            let last = 0;
+            for (let i = 0; i < text.length; i++) {
+                const rep = ESC_TBL[text.charCodeAt(i)];
+                if (rep) {
+                    out += text.slice(last, i) + rep;
+                    last = i + 1;
+                }
+            }
+            return out + text.slice(last);
         }
         
-        // 层级选择变化事件
-        function onLevelChange(selectElement) {
+        // 层级选择变化事件（当前行的新值由change委托回写模型）
+        async function onLevelChange(selectElement) {
             // 获取当前行的索引
-            const rowIndex = parseInt(selectElement.id.split('_')[1]);
-            
+            const rowIndex = parseInt(selectElement.closest('tr').dataset.index);
+
             // 检查是否有其他选中的行
-            const checkboxes = document.querySelectorAll('.bookmark-select:checked');
-            if (checkboxes.length > 1) {
+            if (selectedIndices.size > 1) {
                 // 如果有多个选中项，询问是否应用到所有选中项
-                if (confirm(`是否将层级 ${selectElement.value} 应用到所有选中的 ${checkboxes.length} 个书签？`)) {
-                    checkboxes.forEach(checkbox => {
-                        const index = parseInt(checkbox.dataset.index);
-                        const levelSelect = document.getElementById(`level_${index}`);
-                        if (levelSelect && index !== rowIndex) {
-                            levelSelect.value = selectElement.value;
+                if (await confirmAsync(`是否将层级 ${selectElement.value} 应用到所有选中的 ${selectedIndices.size} 个书签？`)) {
+                    const level = parseInt(selectElement.value);
+                    selectedIndices.forEach(index => {
+                        if (index !== rowIndex && bookmarksData[index]) {
+                            bookmarksData[index].level = level;
                         }
                     });
+                    renderWindow();
                 }
             }
         }
         
-        // 拖拽开始
+        // 拖拽开始（委托到tbody，从事件目标反查所在行）
         function handleDragStart(e) {
-            draggedRow = this;
-            this.classList.add('dragging');
+            const row = e.target.closest('.bookmark-row');
+            if (!row) return;
+            draggedRow = row;
+            row.classList.add('dragging');
             e.dataTransfer.effectAllowed = 'move';
-            e.dataTransfer.setData('text/html', this.innerHTML);
+            e.dataTransfer.setData('text/html', row.innerHTML);
         }
         
-        // 拖拽经过
+        // 拖拽经过：dragover每秒触发几十次，这里按帧合并，
+        // 每帧最多执行一次真正的测量和移动
+        let dragFrame = 0;
+        let lastDragEvent = null;
+
         function handleDragOver(e) {
             e.preventDefault();
             e.dataTransfer.dropEffect = 'move';
-            
-            const tbody = document.querySelector('#bookmarksTable tbody');
-            const rows = Array.from(tbody.querySelectorAll('.bookmark-row'));
-            const draggingRow = rows.find(row => row.classList.contains('dragging'));
+            lastDragEvent = e;
+            if (dragFrame) return;
+            dragFrame = requestAnimationFrame(() => {
+                dragFrame = 0;
+                doDragOver(lastDragEvent);
+            });
+        }
+
+        function doDragOver(e) {
             const targetRow = e.target.closest('.bookmark-row');
-            
-            if (targetRow && targetRow !== draggingRow) {
-                const bounding = targetRow.getBoundingClientRect();
-                const offset = bounding.y + (bounding.height / 2);
-                
-                if (e.clientY <= offset) {
-                    tbody.insertBefore(draggingRow, targetRow);
-                } else {
-                    tbody.insertBefore(draggingRow, targetRow.nextSibling);
-                }
+            if (!targetRow || !draggedRow || targetRow === draggedRow) return;
+
+            // 测量阶段：所有布局读取先做完
+            const bounding = targetRow.getBoundingClientRect();
+            const insertAbove = e.clientY <= bounding.y + (bounding.height / 2);
+            const reference = insertAbove ? targetRow : targetRow.nextSibling;
+
+            // 写入阶段：每帧只有这一次DOM变更，不会读写交错触发重排
+            if (reference !== draggedRow && draggedRow.nextSibling !== reference) {
+                bookmarksTbody.insertBefore(draggedRow, reference);
             }
         }
         
@@ -479,145 +555,115 @@ def get_html_content():
             return false;
         }
         
-        // 拖拽结束
+        // 拖拽结束：按落点位置调整数据模型，再重绘窗口
         function handleDragEnd() {
-            this.classList.remove('dragging');
+            if (dragFrame) {
+                cancelAnimationFrame(dragFrame);
+                dragFrame = 0;
+            }
+            if (!draggedRow) return;
+            const row = draggedRow;
+            row.classList.remove('dragging');
             draggedRow = null;
-            
-            // 更新索引
-            updateBookmarkIndices();
+
+            const oldIndex = parseInt(row.dataset.index);
+            const rendered = Array.from(bookmarksTbody.querySelectorAll('.bookmark-row'));
+            const pos = rendered.indexOf(row);
+            // 拖拽期间窗口重绘（如容器自动滚动）会把draggedRow换掉，
+            // 此时落点位置不可知，放弃本次移动而不是按错误索引插入
+            if (pos === -1) {
+                renderWindow();
+                return;
+            }
+            const newIndex = windowStart + pos;
+
+            if (newIndex !== oldIndex && bookmarksData[oldIndex]) {
+                const [moved] = bookmarksData.splice(oldIndex, 1);
+                bookmarksData.splice(newIndex, 0, moved);
+                const [movedOriginal] = originalBookmarksData.splice(oldIndex, 1);
+                originalBookmarksData.splice(newIndex, 0, movedOriginal);
+                remapSelectionAfterMove(oldIndex, newIndex);
+                lastOffsetRenderKey = null;
+            }
+            renderWindow();
         }
-        
-        // 更新书签索引
-        function updateBookmarkIndices() {
-            const rows = document.querySelectorAll('#bookmarksTable tbody tr');
-            rows.forEach((row, index) => {
-                const checkbox = row.querySelector('.bookmark-select');
-                const levelSelect = row.querySelector('select');
-                const titleInput = row.querySelector('input[type="text"]');
-                const pageInput = row.querySelector('input[type="number"]');
-                
-                if (checkbox) checkbox.dataset.index = index;
-                if (levelSelect) levelSelect.id = `level_${index}`;
-                if (titleInput) titleInput.id = `title_${index}`;
-                if (pageInput) pageInput.id = `page_${index}`;
+
+        // 单项从from移到to后，选中索引跟着平移
+        function remapSelectionAfterMove(from, to) {
+            const next = new Set();
+            selectedIndices.forEach(i => {
+                let n = i;
+                if (i === from) {
+                    n = to;
+                } else if (from < to && i > from && i <= to) {
+                    n = i - 1;
+                } else if (to < from && i >= to && i < from) {
+                    n = i + 1;
+                }
+                next.add(n);
             });
+            selectedIndices = next;
         }
         
         // 添加书签到末尾
         function addBookmark() {
-            const tbody = document.querySelector('#bookmarksTable tbody');
-            const rowCount = tbody.children.length;
-            
-            const row = document.createElement('tr');
-            row.className = 'bookmark-row';
-            row.draggable = true;
-            row.innerHTML = `
-                <td><input type="checkbox" class="bookmark-select" data-index="${rowCount}"></td>
-                <td>
-                    <select class="level-select" id="level_${rowCount}" onchange="onLevelChange(this)">
-                        <option value="0" selected>级别0</option>
-                        <option value="1">级别1</option>
-                        <option value="2">级别2</option>
-                        <option value="3">级别3</option>
-                    </select>
-                </td>
-                <td><input type="text" class="title-input" id="title_${rowCount}" value=""></td>
-                <td></td>
-                <td><input type="number" class="page-input" id="page_${rowCount}" value=""></td>
-                <td>
-                    <button class="btn-danger" onclick="removeBookmark(this)">删除</button>
-                </td>
-            `;
-            
-            // 添加拖拽事件
-            row.addEventListener('dragstart', handleDragStart);
-            row.addEventListener('dragover', handleDragOver);
-            row.addEventListener('drop', handleDrop);
-            row.addEventListener('dragend', handleDragEnd);
-            
-            tbody.appendChild(row);
-            updateBookmarkIndices();
+            bookmarksData.push({title: '', page: null, level: 0});
+            originalBookmarksData.push({title: '', page: null, level: 0});
+            lastOffsetRenderKey = null;
+            renderWindow();
+            // 滚动到底部，让新行出现在窗口内
+            bookmarksScroller.scrollTop = bookmarksScroller.scrollHeight;
         }
-        
+
         // 在选中行前添加书签
         function addBookmarkBeforeSelected() {
-            const checkboxes = document.querySelectorAll('.bookmark-select:checked');
-            
-            if (checkboxes.length === 0) {
+            if (selectedIndices.size === 0) {
                 // 没有选中行，添加到末尾
                 addBookmark();
                 return;
             }
-            
-            if (checkboxes.length > 1) {
+
+            if (selectedIndices.size > 1) {
                 showNotification('请只选择一个位置来插入书签', 'error');
                 return;
             }
-            
-            const selectedIndex = parseInt(checkboxes[0].dataset.index);
-            const tbody = document.querySelector('#bookmarksTable tbody');
-            
-            const row = document.createElement('tr');
-            row.className = 'bookmark-row';
-            row.draggable = true;
-            row.innerHTML = `
-                <td><input type="checkbox" class="bookmark-select" data-index="${selectedIndex}"></td>
-                <td>
-                    <select class="level-select" id="level_${selectedIndex}" onchange="onLevelChange(this)">
-                        <option value="0" selected>级别0</option>
-                        <option value="1">级别1</option>
-                        <option value="2">级别2</option>
-                        <option value="3">级别3</option>
-                    </select>
-                </td>
-                <td><input type="text" class="title-input" id="title_${selectedIndex}" value=""></td>
-                <td></td>
-                <td><input type="number" class="page-input" id="page_${selectedIndex}" value=""></td>
-                <td>
-                    <button class="btn-danger" onclick="removeBookmark(this)">删除</button>
-                </td>
-            `;
-            
-            // 添加拖拽事件
-            row.addEventListener('dragstart', handleDragStart);
-            row.addEventListener('dragover', handleDragOver);
-            row.addEventListener('drop', handleDrop);
-            row.addEventListener('dragend', handleDragEnd);
-            
-            // 插入到选中行之前
-            const selectedRow = tbody.children[selectedIndex];
-            tbody.insertBefore(row, selectedRow);
-            updateBookmarkIndices();
+
+            const selectedIndex = selectedIndices.values().next().value;
+            bookmarksData.splice(selectedIndex, 0, {title: '', page: null, level: 0});
+            originalBookmarksData.splice(selectedIndex, 0, {title: '', page: null, level: 0});
+            const next = new Set();
+            selectedIndices.forEach(i => next.add(i >= selectedIndex ? i + 1 : i));
+            selectedIndices = next;
+            lastOffsetRenderKey = null;
+            renderWindow();
         }
-        
+
         // 删除书签
         function removeBookmark(button) {
             const row = button.closest('tr');
-            if (row) {
-                row.remove();
-                updateBookmarkIndices();
-            }
+            if (!row) return;
+            const index = parseInt(row.dataset.index);
+            bookmarksData.splice(index, 1);
+            originalBookmarksData.splice(index, 1);
+            const next = new Set();
+            selectedIndices.forEach(i => {
+                if (i === index) return;
+                next.add(i > index ? i - 1 : i);
+            });
+            selectedIndices = next;
+            lastOffsetRenderKey = null;
+            renderWindow();
         }
         
-        // 保存书签修改
+        // 保存书签修改：直接读数据模型，不再遍历DOM
         function saveBookmarks() {
-            const rows = document.querySelectorAll('#bookmarksTable tbody tr');
-            const bookmarks = [];
-            
-            rows.forEach((row, index) => {
-                const level = document.getElementById(`level_${index}`).value;
-                const title = document.getElementById(`title_${index}`).value;
-                const page = document.getElementById(`page_${index}`).value;
-                
-                bookmarks.push({
-                    level: parseInt(level),
-                    title: title,
-                    page: page ? parseInt(page) : null
-                });
-            });
-            
-            fetch('/save_bookmarks', {
+            const bookmarks = bookmarksData.map(b => ({
+                level: parseInt(b.level),
+                title: b.title,
+                page: (b.page !== null && b.page !== '') ? parseInt(b.page) : null
+            }));
+
+            abortableFetch('save', '/save_bookmarks', {
                 method: 'POST',
                 headers: {'Content-Type': 'application/json'},
                 body: JSON.stringify({bookmarks: bookmarks})
@@ -631,68 +677,99 @@ def get_html_content():
                 }
             })
             .catch(error => {
+                if (error.name === 'AbortError') return;
                 showNotification('保存出错: ' + error, 'error');
             });
         }
         
-        // 全选/取消全选
+        // 全选/取消全选：选中集合覆盖全部数据，再同步可见行
         function toggleSelectAll() {
-            const selectAll = document.getElementById('selectAll');
-            const checkboxes = document.querySelectorAll('.bookmark-select');
-            
-            checkboxes.forEach(checkbox => {
-                checkbox.checked = selectAll.checked;
+            const checked = DOM.selectAll.checked;
+            selectedIndices.clear();
+            if (checked) {
+                for (let i = 0; i < bookmarksData.length; i++) {
+                    selectedIndices.add(i);
+                }
+            }
+            bookmarksTbody.querySelectorAll('.bookmark-select').forEach(checkbox => {
+                checkbox.checked = checked;
             });
         }
-        
+
         // 反选
         function invertSelection() {
-            const checkboxes = document.querySelectorAll('.bookmark-select');
-            checkboxes.forEach(checkbox => {
-                checkbox.checked = !checkbox.checked;
+            const next = new Set();
+            for (let i = 0; i < bookmarksData.length; i++) {
+                if (!selectedIndices.has(i)) {
+                    next.add(i);
+                }
+            }
+            selectedIndices = next;
+            bookmarksTbody.querySelectorAll('.bookmark-row').forEach(row => {
+                row.querySelector('.bookmark-select').checked =
+                    selectedIndices.has(parseInt(row.dataset.index));
             });
             // 更新全选框状态
-            const allChecked = Array.from(checkboxes).every(cb => cb.checked);
-            document.getElementById('selectAll').checked = allChecked;
+            DOM.selectAll.checked =
+                bookmarksData.length > 0 && selectedIndices.size === bookmarksData.length;
         }
-        
+
         // 删除选中的书签
-        function deleteSelectedBookmarks() {
-            const checkboxes = document.querySelectorAll('.bookmark-select:checked');
-            if (checkboxes.length === 0) {
+        async function deleteSelectedBookmarks() {
+            if (selectedIndices.size === 0) {
                 showNotification('请先选择要删除的书签', 'error');
                 return;
             }
-            
-            if (confirm(`确定要删除选中的 ${checkboxes.length} 个书签吗？`)) {
-                // 从后往前删除，避免索引变化
-                const indices = Array.from(checkboxes)
-                    .map(cb => parseInt(cb.dataset.index))
-                    .sort((a, b) => b - a);
-                
-                indices.forEach(index => {
-                    removeBookmark(index);
-                });
-                
+
+            const count = selectedIndices.size;
+            if (await confirmAsync(`确定要删除选中的 ${count} 个书签吗？`)) {
+                // 一趟过滤完成整批删除，不做K次O(N)的splice
+                bookmarksData = bookmarksData.filter((_, i) => !selectedIndices.has(i));
+                originalBookmarksData = originalBookmarksData.filter((_, i) => !selectedIndices.has(i));
+
+                selectedIndices.clear();
                 // 重置全选按钮
-                document.getElementById('selectAll').checked = false;
-                showNotification(`已删除 ${checkboxes.length} 个书签`, 'success');
+                DOM.selectAll.checked = false;
+                lastOffsetRenderKey = null;
+                renderWindow();
+                showNotification(`已删除 ${count} 个书签`, 'success');
             }
         }
         
+        // 在本地模型上重演服务器回执的交换操作，只重绘窗口，
+        // 不需要服务器返回整表数据做全量重建；选中集合跟着换位
+        function applyMoveOps(ops) {
+            ops.forEach(([from, to]) => {
+                [bookmarksData[from], bookmarksData[to]] =
+                    [bookmarksData[to], bookmarksData[from]];
+                [originalBookmarksData[from], originalBookmarksData[to]] =
+                    [originalBookmarksData[to], originalBookmarksData[from]];
+                const hasFrom = selectedIndices.has(from);
+                const hasTo = selectedIndices.has(to);
+                if (hasFrom !== hasTo) {
+                    if (hasFrom) {
+                        selectedIndices.delete(from);
+                        selectedIndices.add(to);
+                    } else {
+                        selectedIndices.delete(to);
+                        selectedIndices.add(from);
+                    }
+                }
+            });
+            lastOffsetRenderKey = null;
+            renderWindow();
+        }
+
         // 上移选中的书签
         function moveSelectedUp() {
-            const checkboxes = document.querySelectorAll('.bookmark-select:checked');
-            if (checkboxes.length === 0) {
+            if (selectedIndices.size === 0) {
                 showNotification('请先选择要移动的书签', 'error');
                 return;
             }
-            
+
             // 获取选中项的索引并排序
-            const indices = Array.from(checkboxes)
-                .map(cb => parseInt(cb.dataset.index))
-                .sort((a, b) => a - b);
-            
+            const indices = Array.from(selectedIndices).sort((a, b) => a - b);
+
             // 检查是否可以移动（第一个不能移到-1位置）
             if (indices[0] === 0) {
                 showNotification('已到顶部，无法继续上移', 'error');
@@ -700,7 +777,7 @@ def get_html_content():
             }
             
             // 发送到服务器进行移动
-            fetch('/move_bookmark', {
+            abortableFetch('move', '/move_bookmark', {
                 method: 'POST',
                 headers: {'Content-Type': 'application/json'},
                 body: JSON.stringify({indices: indices, direction: 'up'})
@@ -708,40 +785,36 @@ def get_html_content():
             .then(response => response.json())
             .then(data => {
                 if (data.status === 'success') {
-                    renderBookmarks(data.bookmarks, data.original_bookmarks);
+                    applyMoveOps(data.ops || []);
                     showNotification(`已上移 ${indices.length} 个书签`, 'success');
                 } else {
                     showNotification('移动失败: ' + data.message, 'error');
                 }
             })
             .catch(error => {
+                if (error.name === 'AbortError') return;
                 showNotification('移动出错: ' + error, 'error');
             });
         }
         
         // 下移选中的书签
         function moveSelectedDown() {
-            const checkboxes = document.querySelectorAll('.bookmark-select:checked');
-            if (checkboxes.length === 0) {
+            if (selectedIndices.size === 0) {
                 showNotification('请先选择要移动的书签', 'error');
                 return;
             }
-            
-            const totalRows = document.querySelectorAll('#bookmarksTable tbody tr').length;
-            
+
             // 获取选中项的索引并排序（降序）
-            const indices = Array.from(checkboxes)
-                .map(cb => parseInt(cb.dataset.index))
-                .sort((a, b) => b - a);
-            
+            const indices = Array.from(selectedIndices).sort((a, b) => b - a);
+
             // 检查是否可以移动（最后一个不能移到length位置）
-            if (indices[0] === totalRows - 1) {
+            if (indices[0] === bookmarksData.length - 1) {
                 showNotification('已到底部，无法继续下移', 'error');
                 return;
             }
             
             // 发送到服务器进行移动
-            fetch('/move_bookmark', {
+            abortableFetch('move', '/move_bookmark', {
                 method: 'POST',
                 headers: {'Content-Type': 'application/json'},
                 body: JSON.stringify({indices: indices, direction: 'down'})
@@ -749,26 +822,47 @@ def get_html_content():
             .then(response => response.json())
             .then(data => {
                 if (data.status === 'success') {
-                    renderBookmarks(data.bookmarks, data.original_bookmarks);
+                    applyMoveOps(data.ops || []);
                     showNotification(`已下移 ${indices.length} 个书签`, 'success');
                 } else {
                     showNotification('移动失败: ' + data.message, 'error');
                 }
             })
             .catch(error => {
+                if (error.name === 'AbortError') return;
                 showNotification('移动出错: ' + error, 'error');
             });
         }
         
+        // 尾沿防抖：静默期内的连续触发只执行最后一次
+        function debounce(fn, ms) {
+            let timer = null;
+            return function(...args) {
+                clearTimeout(timer);
+                timer = setTimeout(() => fn.apply(this, args), ms);
+            };
+        }
+
+        // 请求在途期间禁用触发按钮，promise落定后恢复，
+        // 防止慢请求期间重复点击；处理函数需返回其请求promise
+        function withBusy(btn, fn) {
+            btn.disabled = true;
+            return Promise.resolve()
+                .then(fn)
+                .finally(() => { btn.disabled = false; });
+        }
+
         // 计算并应用偏移量
         function calculateAndApplyOffset() {
-            const contentStartPage = document.getElementById('contentStartPage').value;
+            const contentStartPage = DOM.contentStartPage.value;
             // 根据新公式计算偏移量: 偏移量 = 正文起始页 - 1
             const offset = parseInt(contentStartPage) - 1;
             
-            document.getElementById('currentOffset').textContent = offset;
-            
-            fetch('/apply_offset', {
+            DOM.currentOffset.textContent = offset;
+
+            // 预览和应用请求并行发出，预览面板在应用返回前就开始填充
+            previewOffsetChanges(offset);
+            abortableFetch('offset', '/apply_offset', {
                 method: 'POST',
                 headers: {'Content-Type': 'application/json'},
                 body: JSON.stringify({offset: offset, type: 'calculated'})
@@ -776,24 +870,33 @@ def get_html_content():
             .then(response => response.json())
             .then(data => {
                 if (data.status === 'success') {
-                    renderBookmarks(data.bookmarks, data.original_bookmarks);
-                    document.getElementById('currentOffset').textContent = data.offset;
+                    // 相同偏移量重复应用时页码没有变化，跳过重建
+                    const renderKey = data.offset + '|' + data.bookmarks.length;
+                    if (renderKey !== lastOffsetRenderKey) {
+                        // 响应不再带original_bookmarks，沿用本地已有的原始列表
+                        renderBookmarks(data.bookmarks, originalBookmarksData);
+                        lastOffsetRenderKey = renderKey;
+                    }
+                    DOM.currentOffset.textContent = data.offset;
                     showNotification(`偏移量已计算并应用: ${offset}`, 'success');
                 } else {
                     showNotification('应用偏移量失败: ' + data.message, 'error');
                 }
             })
             .catch(error => {
+                if (error.name === 'AbortError') return;
                 showNotification('应用偏移量出错: ' + error, 'error');
             });
         }
         
         // 应用手动偏移量
         function applyManualOffset() {
-            const offset = parseInt(document.getElementById('manualOffset').value);
-            document.getElementById('currentOffset').textContent = offset;
-            
-            fetch('/apply_offset', {
+            const offset = parseInt(DOM.manualOffset.value);
+            DOM.currentOffset.textContent = offset;
+
+            // 预览和应用请求并行发出，预览面板在应用返回前就开始填充
+            previewOffsetChanges(offset);
+            abortableFetch('offset', '/apply_offset', {
                 method: 'POST',
                 headers: {'Content-Type': 'application/json'},
                 body: JSON.stringify({offset: offset, type: 'manual'})
@@ -801,22 +904,31 @@ def get_html_content():
             .then(response => response.json())
             .then(data => {
                 if (data.status === 'success') {
-                    renderBookmarks(data.bookmarks, data.original_bookmarks);
-                    document.getElementById('currentOffset').textContent = data.offset;
+                    // 相同偏移量重复应用时页码没有变化，跳过重建
+                    const renderKey = data.offset + '|' + data.bookmarks.length;
+                    if (renderKey !== lastOffsetRenderKey) {
+                        // 响应不再带original_bookmarks，沿用本地已有的原始列表
+                        renderBookmarks(data.bookmarks, originalBookmarksData);
+                        lastOffsetRenderKey = renderKey;
+                    }
+                    DOM.currentOffset.textContent = data.offset;
                     showNotification(`手动偏移量已应用: ${offset}`, 'success');
                 } else {
                     showNotification('应用偏移量失败: ' + data.message, 'error');
                 }
             })
             .catch(error => {
+                if (error.name === 'AbortError') return;
                 showNotification('应用偏移量出错: ' + error, 'error');
             });
         }
         
-        // 预览偏移量变化
-        function previewOffsetChanges() {
-            const offset = parseInt(document.getElementById('currentOffset').textContent) || 0;
-            fetch('/preview_offset', {
+        // 预览偏移量变化；不传参时使用当前显示的偏移量
+        function previewOffsetChanges(offset) {
+            if (offset === undefined) {
+                offset = parseInt(DOM.currentOffset.textContent) || 0;
+            }
+            abortableFetch('preview', '/preview_offset', {
                 method: 'POST',
                 headers: {'Content-Type': 'application/json'},
                 body: JSON.stringify({offset: offset})
@@ -824,31 +936,33 @@ def get_html_content():
             .then(response => response.json())
             .then(data => {
                 if (data.status === 'success') {
-                    const previewDiv = document.getElementById('offsetPreview');
-                    let html = '<h4>偏移量应用预览:</h4><ul>';
-                    data.changes.forEach(change => {
-                        html += `<li>${escapeHtml(change.title)}: ${change.original_page || '无页码'} → ${change.new_page || '无页码'}</li>`;
-                    });
-                    html += '</ul>';
-                    previewDiv.innerHTML = html;
+                    // 标题已由服务端转义（title_html），一次map/join拼出整段HTML
+                    DOM.offsetPreview.innerHTML = '<h4>偏移量应用预览:</h4><ul>' +
+                        data.changes.map(change =>
+                            `<li>${change.title_html}: ${change.original_page || '无页码'} → ${change.new_page || '无页码'}</li>`
+                        ).join('') + '</ul>';
                 } else {
                     showNotification('预览失败: ' + data.message, 'error');
                 }
             })
             .catch(error => {
+                if (error.name === 'AbortError') return;
                 showNotification('预览出错: ' + error, 'error');
             });
         }
-        
+
+        // 快速连续触发的偏移操作合并成最后一次执行；
+        // 配合abortableFetch，被取代的在途请求会被中止
+        const calculateAndApplyOffsetDebounced = debounce(calculateAndApplyOffset, 200);
+        const applyManualOffsetDebounced = debounce(applyManualOffset, 200);
+        const previewOffsetChangesDebounced = debounce(previewOffsetChanges, 200);
+
         // 提取目录页
         function extractTocPages() {
-            fetch('/extract_toc', {
-                method: 'POST'
-            })
-            .then(response => response.json())
+            return postJSON('/extract_toc')
             .then(data => {
                 if (data.status === 'success' && data.image_url) {
-                    document.getElementById('tocImageContainer').innerHTML = 
+                    DOM.tocImageContainer.innerHTML = 
                         `<div class="toc-image-container"><img src="${data.image_url}" class="toc-image" alt="目录页"></div>`;
                     showNotification('目录页提取成功', 'success');
                 } else {
@@ -862,18 +976,13 @@ def get_html_content():
         
         // 更新目录页范围
         function updateTocPages() {
-            const tocStartPage = document.getElementById('tocStartPage').value;
-            const tocEndPage = document.getElementById('tocEndPage').value;
+            const tocStartPage = DOM.tocStartPage.value;
+            const tocEndPage = DOM.tocEndPage.value;
             
-            fetch('/update_toc_pages', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({
-                    toc_start_page: parseInt(tocStartPage),
-                    toc_end_page: parseInt(tocEndPage)
-                })
+            return postJSON('/update_toc_pages', {
+                toc_start_page: parseInt(tocStartPage),
+                toc_end_page: parseInt(tocEndPage)
             })
-            .then(response => response.json())
             .then(data => {
                 if (data.status === 'success') {
                     showNotification('目录页范围已更新', 'success');
@@ -886,28 +995,45 @@ def get_html_content():
             });
         }
         
-        // 生成PDF
+        // 生成PDF：服务器立即返回任务ID，这里轮询任务状态直到完成
         function generatePdf() {
-            const outputFileName = document.getElementById('outputFileName').value;
-            
-            fetch('/generate_pdf', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({output_filename: outputFileName})
+            const outputFileName = DOM.outputFileName.value;
+
+            return postJSON('/generate_pdf', {output_filename: outputFileName})
+            .then(data => {
+                if (data.status === 'success' && data.job_id) {
+                    DOM.generationStatus.innerHTML =
+                        `<div class="status status-info">PDF生成中，请稍候...</div>`;
+                    pollGenerateJob(data.job_id);
+                } else {
+                    DOM.generationStatus.innerHTML = `<div class="status status-error">PDF生成失败: ${data.message}</div>`;
+                    showNotification('PDF生成失败: ' + data.message, 'error');
+                }
             })
+            .catch(error => {
+                DOM.generationStatus.innerHTML =
+                    `<div class="status status-error">PDF生成出错: ${error}</div>`;
+                showNotification('PDF生成出错: ' + error, 'error');
+            });
+        }
+
+        // 轮询后台生成任务的状态
+        function pollGenerateJob(jobId) {
+            fetch(`/job_status?id=${jobId}`)
             .then(response => response.json())
             .then(data => {
-                const statusDiv = document.getElementById('generationStatus');
-                if (data.status === 'success') {
-                    statusDiv.innerHTML = `<div class="status status-success">PDF生成成功: ${data.message}</div>`;
+                if (data.status === 'running') {
+                    setTimeout(() => pollGenerateJob(jobId), 500);
+                } else if (data.status === 'done') {
+                    DOM.generationStatus.innerHTML = `<div class="status status-success">PDF生成成功: ${data.message}</div>`;
                     showNotification('PDF生成成功', 'success');
                 } else {
-                    statusDiv.innerHTML = `<div class="status status-error">PDF生成失败: ${data.message}</div>`;
+                    DOM.generationStatus.innerHTML = `<div class="status status-error">PDF生成失败: ${data.message}</div>`;
                     showNotification('PDF生成失败: ' + data.message, 'error');
                 }
             })
             .catch(error => {
-                document.getElementById('generationStatus').innerHTML = 
+                DOM.generationStatus.innerHTML =
                     `<div class="status status-error">PDF生成出错: ${error}</div>`;
                 showNotification('PDF生成出错: ' + error, 'error');
             });
@@ -915,13 +1041,10 @@ def get_html_content():
         
         // 删除已上传文件
         function deleteUploadedFile() {
-            fetch('/delete_file', {
-                method: 'POST'
-            })
-            .then(response => response.json())
+            return postJSON('/delete_file')
             .then(data => {
                 if (data.status === 'success') {
-                    document.getElementById('deleteFileBtn').classList.add('hidden');
+                    DOM.deleteFileBtn.classList.add('hidden');
                     showNotification('文件已删除', 'success');
                 } else {
                     showNotification('删除文件失败: ' + data.message, 'error');
@@ -938,12 +1061,9 @@ def get_html_content():
         }
         
         // 退出应用程序
-        function exitApplication() {
-            if (confirm('确定要退出程序吗？这将关闭Web服务并清理所有临时文件。')) {
-                fetch('/exit', {
-                    method: 'POST'
-                })
-                .then(response => response.json())
+        async function exitApplication() {
+            if (await confirmAsync('确定要退出程序吗？这将关闭Web服务并清理所有临时文件。')) {
+                postJSON('/exit')
                 .then(data => {
                     if (data.status === 'success') {
                         showNotification('程序已退出，您可以关闭此窗口', 'success');
@@ -962,21 +1082,31 @@ def get_html_content():
             }
         }
         
-        // 显示通知
+        // 显示通知：小池子里的div循环使用，
+        // 不再每次通知都创建再销毁节点
+        const NOTIF_POOL = [];
+        for (let i = 0; i < 3; i++) {
+            const slot = document.createElement('div');
+            slot.style.display = 'none';
+            slot.style.top = `${20 + i * 60}px`;
+            document.body.appendChild(slot);
+            NOTIF_POOL.push(slot);
+        }
+
         function showNotification(message, type) {
-            // 创建通知div
-            const notification = document.createElement('div');
-            notification.className = `notification notification-${type}`;
-            notification.textContent = message;
-            
-            // 添加到页面
-            document.body.appendChild(notification);
-            
-            // 3秒后自动移除
-            setTimeout(() => {
-                if (notification.parentNode) {
-                    notification.parentNode.removeChild(notification);
-                }
+            // 取一个空闲槽位，全忙时复用最早占用的那个
+            const slot = NOTIF_POOL.find(s => s.style.display === 'none') || NOTIF_POOL[0];
+            if (slot._hideTimer) {
+                clearTimeout(slot._hideTimer);
+            }
+            slot.className = `notification notification-${type}`;
+            slot.textContent = message;
+            slot.style.display = 'block';
+
+            // 3秒后自动隐藏并归还池子
+            slot._hideTimer = setTimeout(() => {
+                slot.style.display = 'none';
+                slot._hideTimer = null;
             }, 3000);
         }
         
@@ -985,12 +1115,13 @@ def get_html_content():
             e.preventDefault();
             
             const formData = new FormData();
-            const fileInput = document.getElementById('pdfFile');
+            const fileInput = DOM.pdfFile;
             const file = fileInput.files[0];
             
-            // 设置默认输出文件名
-            const defaultOutputName = file.name.replace('.pdf', '') + '_bookmarked.pdf';
-            document.getElementById('outputFileName').value = defaultOutputName;
+            // 设置默认输出文件名（锚定结尾的.pdf，大小写不敏感，
+            // 不会误删文件名中间出现的".pdf"）
+            const defaultOutputName = file.name.replace(PDF_EXT_RE, '') + '_bookmarked.pdf';
+            DOM.outputFileName.value = defaultOutputName;
             
             formData.append('pdfFile', file);
             
@@ -1000,10 +1131,10 @@ def get_html_content():
             })
             .then(response => response.json())
             .then(data => {
-                const statusDiv = document.getElementById('uploadStatus');
+                const statusDiv = DOM.uploadStatus;
                 if (data.status === 'success') {
                     statusDiv.innerHTML = '<div class="status status-success">文件上传成功: ' + data.filename + '</div>';
-                    document.getElementById('deleteFileBtn').classList.remove('hidden');
+                    DOM.deleteFileBtn.classList.remove('hidden');
                     showNotification('文件上传成功', 'success');
                 } else {
                     statusDiv.innerHTML = '<div class="status status-error">上传失败: ' + data.message + '</div>';
@@ -1011,15 +1142,14 @@ def get_html_content():
                 }
             })
             .catch(error => {
-                document.getElementById('uploadStatus').innerHTML = 
+                DOM.uploadStatus.innerHTML = 
                     '<div class="status status-error">上传出错: ' + error + '</div>';
                 showNotification('上传出错: ' + error, 'error');
             });
         });
         
-        // 复制提示词到剪贴板
-        function copyPrompt() {
-            const promptText = `请分析这个PDF文档的目录页，并按照以下要求输出目录结构：
+        // 提示词是常量，提升到模块级只构造一次
+        const PROMPT_TEXT = `请分析这个PDF文档的目录页，并按照以下要求输出目录结构：
 
 1. 保留完整的层级结构信息，使用缩进或编号方式表示层级关系
 2. 每行输出一个目录项，格式为："标题内容 ...................... 页码"（页码前的点线为可选）
@@ -1039,34 +1169,225 @@ def get_html_content():
 # 第二章 文献综述 5
 ## 2.1 国内研究现状 5
 ## 2.2 国外研究现状 8`;
-            
-            navigator.clipboard.writeText(promptText).then(() => {
+
+        // 页面上的提示词展示区由同一份常量填充，HTML里不再重复一份
+        document.getElementById('promptContainer').textContent = PROMPT_TEXT;
+
+        // 复制提示词到剪贴板
+        function copyPrompt() {
+            navigator.clipboard.writeText(PROMPT_TEXT).then(() => {
                 showNotification('提示词已复制到剪贴板', 'success');
-            }).catch(err => {
-                showNotification('复制失败: ' + err, 'error');
+            }).catch(() => {
+                // clipboard API不可用（如非安全上下文）时走隐藏textarea兜底
+                copyPromptFallback();
             });
         }
+
+        let promptFallbackArea = null;
+        function copyPromptFallback() {
+            if (!promptFallbackArea) {
+                promptFallbackArea = document.createElement('textarea');
+                promptFallbackArea.value = PROMPT_TEXT;
+                promptFallbackArea.setAttribute('readonly', '');
+                promptFallbackArea.style.cssText = 'position:fixed;left:-9999px;top:0;';
+                document.body.appendChild(promptFallbackArea);
+            }
+            promptFallbackArea.select();
+            try {
+                document.execCommand('copy');
+                showNotification('提示词已复制到剪贴板', 'success');
+            } catch (err) {
+                showNotification('复制失败: ' + err, 'error');
+            }
+        }
         
         // 页面加载完成后检查是否有已上传文件
         window.addEventListener('load', function() {
-            fetch('/check_file')
-            .then(response => response.json())
+            // 文件与草稿状态合并成一个接口，初始化只需一次往返
+            postJSON('/init_state')
             .then(data => {
                 if (data.has_file) {
-                    document.getElementById('deleteFileBtn').classList.remove('hidden');
+                    DOM.deleteFileBtn.classList.remove('hidden');
+                }
+                if (data.has_draft) {
+                    DOM.draftIndicator.style.display = 'block';
                 }
-                
-                // 检查是否有草稿
-                fetch('/check_draft')
-                .then(response => response.json())
-                .then(draftData => {
-                    if (draftData.has_draft) {
-                        document.getElementById('draftIndicator').style.display = 'block';
-                    }
-                });
             });
         });
-    </script>
+    
+'''
+
+_HTML = '''
+<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>PDF书签生成器</title>
+    <link rel="stylesheet" href="/static/app.css?v=__ASSET_VERSION__">
+</head>
+<body>
+    <div class="container">
+        <h1>PDF书签生成器 Beta</h1>
+        <div class="draft-indicator" id="draftIndicator">
+            检测到草稿文件，已自动加载上次的工作进度
+        </div>
+        <div class="page-info">
+            <p><strong>页码说明：</strong>用户输入的页码为PDF显示页码（1基索引），系统会自动转换为PDF内部索引（0基索引）</p>
+        </div>
+        
+        <!-- 文件上传部分 -->
+        <div class="section">
+            <h2>1. 上传PDF文件</h2>
+            <form id="uploadForm" enctype="multipart/form-data">
+                <label for="pdfFile">选择PDF文件:</label>
+                <input type="file" id="pdfFile" name="pdfFile" accept=".pdf" required>
+                <button type="submit">上传PDF</button>
+                <button type="button" id="deleteFileBtn" class="btn-danger hidden" onclick="withBusy(this, deleteUploadedFile)">删除已上传文件</button>
+            </form>
+            <div id="uploadStatus"></div>
+        </div>
+        
+        <!-- 目录页提取部分 -->
+        <div class="section">
+            <h2>2. 提取目录页（可选）</h2>
+            <label for="tocStartPage">目录起始页:</label>
+            <input type="number" id="tocStartPage" min="1" value="1">
+            
+            <label for="tocEndPage">目录结束页:</label>
+            <input type="number" id="tocEndPage" min="1" value="1">
+            
+            <button onclick="withBusy(this, updateTocPages)" class="btn-warning">更新目录页范围</button>
+            <button onclick="withBusy(this, extractTocPages)">提取目录页</button>
+            <button onclick="openQwen()" class="btn-info">使用通义千问识别目录</button>
+            <div>
+                <div style="display: flex; align-items: center;">
+                    <div style="flex-grow: 1;">
+                        <div style="font-weight: bold;">推荐提示词：</div>
+                        <div id="promptContainer" style="max-height: 100px; overflow-y: auto; border: 1px solid #ccc; padding: 10px; background-color: #f9f9f9; white-space: pre-wrap;"></div>
+                    </div>
+                    <div style="margin-left: 10px;">
+                        <button onclick="copyPrompt()" class="btn-secondary">复制提示词</button>
+                    </div>
+                </div>
+            </div>
+            <div id="tocImageContainer"></div>
+        </div>
+        
+        <!-- 目录输入部分 -->
+        <div class="section">
+            <h2>3. 输入目录文本</h2>
+            <label for="tocText">粘贴目录内容:</label>
+            <textarea id="tocText" rows="10" placeholder="在此粘贴目录内容&#10;支持格式示例:&#10;章节1 标题 ...................... 1&#10;2 第二章 标题&#10;# 第一章 标题 5&#10;* 第一节 标题 10&#10;## 1.1 第一节标题 10"></textarea>
+            <button onclick="withBusy(this, parseTocText)">解析目录</button>
+            <button onclick="previewParseResult()" class="btn-info">预览解析结果</button>
+            <div id="parseStatus"></div>
+            <div id="parsePreview" class="preview-section" style="display: none;"></div>
+        </div>
+        
+        <!-- 参数设置部分 -->
+        <div class="section">
+            <h2>4. 设置参数</h2>
+            <div class="offset-display">
+                <strong>当前使用的偏移量:</strong> <span id="currentOffset">0</span>
+            </div>
+            
+            <label for="contentStartPage">正文起始页:</label>
+            <input type="number" id="contentStartPage" min="1" value="1">
+            
+            <button onclick="calculateAndApplyOffsetDebounced()">计算并应用偏移量</button>
+            
+            <label for="manualOffset">手动设置偏移量:</label>
+            <input type="number" id="manualOffset" value="0">
+            <button onclick="applyManualOffsetDebounced()">应用手动偏移量</button>
+            
+            <div class="preview-section">
+                <h3>偏移量预览</h3>
+                <p>应用偏移量后，将更新书签编辑器中的PDF页码列（实际页码 = 原始页码 + 偏移量）</p>
+                <button onclick="previewOffsetChangesDebounced()">预览偏移量变化</button>
+                <div id="offsetPreview"></div>
+            </div>
+            
+            <label for="outputFileName">输出文件名:</label>
+            <input type="text" id="outputFileName" value="">
+        </div>
+        
+        <!-- 书签编辑部分 -->
+        <div class="section">
+            <h2>5. 编辑书签</h2>
+            <div class="actions">
+                <button onclick="addBookmarkBeforeSelected()">在选中行前添加书签</button>
+                <button onclick="addBookmark()">添加书签到末尾</button>
+                <button onclick="saveBookmarks()">保存修改</button>
+                <button class="btn-danger" onclick="deleteSelectedBookmarks()">删除选中书签</button>
+                <button class="btn-warning" onclick="moveSelectedUp()">上移</button>
+                <button class="btn-warning" onclick="moveSelectedDown()">下移</button>
+                <button onclick="invertSelection()">反选</button>
+            </div>
+            <div class="bookmarks-container">
+                <table id="bookmarksTable">
+                    <thead>
+                        <tr>
+                            <th><input type="checkbox" id="selectAll" onchange="toggleSelectAll()"></th>
+                            <th>层级</th>
+                            <th>标题</th>
+                            <th>原始页码</th>
+                            <th>PDF页码</th>
+                            <th>操作</th>
+                        </tr>
+                    </thead>
+                    <tbody id="bookmarksTableBody">
+                        <!-- 书签将在这里动态生成 -->
+                    </tbody>
+                </table>
+                <!-- 行骨架只让HTML解析器解析一次，渲染时按模板克隆 -->
+                <template id="bookmarkRowTpl">
+                    <tr class="bookmark-row" draggable="true">
+                        <td><input type="checkbox" class="bookmark-select"></td>
+                        <td>
+                            <select class="level-select">
+                                <option value="0">级别0</option>
+                                <option value="1">级别1</option>
+                                <option value="2">级别2</option>
+                                <option value="3">级别3</option>
+                            </select>
+                        </td>
+                        <td><input type="text" class="title-input"></td>
+                        <td></td>
+                        <td><input type="number" class="page-input"></td>
+                        <td>
+                            <button class="btn-danger">删除</button>
+                        </td>
+                    </tr>
+                </template>
+            </div>
+        </div>
+        
+        <!-- 生成PDF部分 -->
+        <div class="section">
+            <h2>6. 生成PDF</h2>
+            <button class="btn-secondary" onclick="withBusy(this, generatePdf)">生成PDF</button>
+            <button class="btn-danger" onclick="exitApplication()">退出程序</button>
+            <div id="generationStatus"></div>
+        </div>
+    </div>
+
+    <script src="/static/app.js?v=__ASSET_VERSION__"></script>
 </body>
 </html>
-    '''
\ No newline at end of file
+    '''
+
+
+def get_css_content():
+    """返回独立的样式表内容"""
+    return _CSS
+
+
+def get_js_content():
+    """返回独立的脚本内容"""
+    return _JS
+
+
+def get_html_content(asset_version=''):
+    """返回页面HTML外壳，asset_version作为静态资源的缓存指纹"""
+    return _HTML.replace('__ASSET_VERSION__', asset_version)
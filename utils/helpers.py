@@ -5,7 +5,15 @@ Utility functions for PDF Bookmark Generator
 import os
 import json
 import tempfile
-from typing import Optional, List, Dict, Any
+from functools import lru_cache
+from typing import Optional, Dict, Any
+
+# 尝试导入orjson：C实现的JSON序列化，比标准库json快一个数量级
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 
 def save_json_file(file_path: str, data: Dict[Any, Any]) -> bool:
@@ -13,43 +21,67 @@ def save_json_file(file_path: str, data: Dict[Any, Any]) -> bool:
     Save data to a JSON file
     """
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # 统一先在内存序列化成字节再一次写入：
+        # orjson在C层完成（含缩进），退回标准库时也避免逐段写文件
+        if ORJSON_AVAILABLE:
+            buf = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+        else:
+            buf = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+        with open(file_path, 'wb') as f:
+            f.write(buf)
         return True
     except Exception as e:
         print(f"保存文件失败: {e}")
         return False
 
 
+@lru_cache(maxsize=32)
+def _load_json_cached(file_path: str, mtime: float) -> Dict[Any, Any]:
+    """按(路径, 修改时间)缓存解析结果；文件被重写后mtime变化自动失效"""
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    return orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
+
+
 def load_json_file(file_path: str) -> Optional[Dict[Any, Any]]:
     """
     Load data from a JSON file
+
+    同一份未修改的文件重复加载时直接返回缓存对象，
+    调用方应把返回值当作只读数据
     """
     try:
         if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return _load_json_cached(file_path, os.path.getmtime(file_path))
     except Exception as e:
         print(f"加载文件失败: {e}")
     return None
 
 
+# 临时目录在进程生命周期内不变，导入时解析一次
+_TEMP_DIR = tempfile.gettempdir()
+
+
 def get_temp_dir() -> str:
     """
     Get the system temporary directory
     """
-    return tempfile.gettempdir()
+    return _TEMP_DIR
+
+
+# 转义表在导入时构建一次，translate在C层一趟扫完整个字符串，
+# 不再为每个字符做Python级的字典查找和生成器迭代
+_HTML_ESCAPE_TABLE = str.maketrans({
+    "&": "&amp;",
+    '"': "&quot;",
+    "'": "&#x27;",
+    ">": "&gt;",
+    "<": "&lt;",
+})
 
 
 def escape_html(text: str) -> str:
     """
     Escape HTML special characters
     """
-    html_escape_table = {
-        "&": "&amp;",
-        '"': "&quot;",
-        "'": "&#x27;",
-        ">": "&gt;",
-        "<": "&lt;",
-    }
-    return "".join(html_escape_table.get(c, c) for c in text)
\ No newline at end of file
+    return text.translate(_HTML_ESCAPE_TABLE)
\ No newline at end of file